@@ -5,6 +5,9 @@ from typing import Optional
 import psycopg2
 from psycopg2 import sql
 
+from metrics import INTENT_SECONDS, timed
+from schema_catalog import catalog
+from statements import execute
 from text_parser import parse_command
 
 # Monat → Basis-Spaltenpräfix
@@ -91,10 +94,12 @@ def apply_adjust_person_fte_rel(conn, table_name: str, data: dict, year: int):
 
     colname = month_col_for_year(month_name, year)
     tbl_ident = _validate_table_name(table_name)
+    catalog.ensure_columns(conn, table_name, [colname])
     col_ident = sql.Identifier(colname)
 
     with conn.cursor() as cur:
-        cur.execute(
+        execute(
+            cur,
             sql.SQL("SELECT id, {col} FROM {tbl} WHERE name = %s AND year = %s").format(
                 col=col_ident, tbl=tbl_ident
             ),
@@ -108,14 +113,14 @@ def apply_adjust_person_fte_rel(conn, table_name: str, data: dict, year: int):
         current_val = Decimal(str(current_val or 0))
         new_val = current_val + delta
 
-        cur.execute(
+        execute(
+            cur,
             sql.SQL("UPDATE {tbl} SET {col} = %s, updated_at = now() WHERE id = %s").format(
                 col=col_ident, tbl=tbl_ident
             ),
             (new_val, emp_id),
         )
 
-    conn.commit()
     return {
         "employee_id": str(emp_id),
         "table": table_name,
@@ -143,10 +148,12 @@ def apply_adjust_person_fte_abs(conn, table_name: str, data: dict, year: int):
         raise ValueError("Monat fehlt für die VK-Setzung.")
 
     tbl_ident = _validate_table_name(table_name)
+    catalog.ensure_columns(conn, table_name, [colname])
     col_ident = sql.Identifier(colname)
 
     with conn.cursor() as cur:
-        cur.execute(
+        execute(
+            cur,
             sql.SQL("SELECT id, {col} FROM {tbl} WHERE name = %s AND year = %s").format(
                 col=col_ident, tbl=tbl_ident
             ),
@@ -159,14 +166,14 @@ def apply_adjust_person_fte_abs(conn, table_name: str, data: dict, year: int):
         emp_id, current_val = row
         current_val = Decimal(str(current_val or 0))
 
-        cur.execute(
+        execute(
+            cur,
             sql.SQL("UPDATE {tbl} SET {col} = %s, updated_at = now() WHERE id = %s").format(
                 col=col_ident, tbl=tbl_ident
             ),
             (target_val, emp_id),
         )
 
-    conn.commit()
     return {
         "employee_id": str(emp_id),
         "table": table_name,
@@ -195,9 +202,11 @@ def apply_adjust_person_fte_range(conn, table_name: str, data: dict):
     end_idx = dt_to.month - 1
     target_cols = [sql.Identifier(f"{m}_{year}") for m in MONTH_ORDER[start_idx : end_idx + 1]]
     target_col_names = [f"{m}_{year}" for m in MONTH_ORDER[start_idx : end_idx + 1]]
+    catalog.ensure_columns(conn, table_name, target_col_names)
 
     with conn.cursor() as cur:
-        cur.execute(
+        execute(
+            cur,
             sql.SQL("SELECT id, {} FROM {} WHERE name = %s AND year = %s").format(
                 sql.SQL(", ").join(target_cols), tbl_ident
             ),
@@ -212,13 +221,13 @@ def apply_adjust_person_fte_range(conn, table_name: str, data: dict):
         assignments = sql.SQL(", ").join(
             sql.SQL("{} = %s").format(col) for col in target_cols
         )
-        cur.execute(
+        execute(
+            cur,
             sql.SQL("UPDATE {tbl} SET {assign}, updated_at = now() WHERE id = %s").format(
                 tbl=tbl_ident, assign=assignments
             ),
             (*new_vals, emp_id),
         )
-    conn.commit()
     return {
         "employee_id": str(emp_id),
         "table": table_name,
@@ -236,7 +245,10 @@ def apply_transfer_staff_unit(conn, table_name: str, data: dict):
     → setzt dept in der entsprechenden Jahreszeile.
     """
     name = data["name"].strip()
-    target_dept = data["unit"].strip()
+    # transfer_staff_unit liefert "unit", move_employee_to_station_year "dept"
+    target_dept = (data.get("unit") or data.get("dept") or "").strip()
+    if not target_dept:
+        raise ValueError("Keine Zielstation angegeben.")
     # accept either a date or a bare year (from move_employee_to_station_year)
     eff_date = None
     year = None
@@ -251,7 +263,8 @@ def apply_transfer_staff_unit(conn, table_name: str, data: dict):
     tbl_ident = _validate_table_name(table_name)
 
     with conn.cursor() as cur:
-        cur.execute(
+        execute(
+            cur,
             sql.SQL("SELECT id, dept FROM {tbl} WHERE name = %s AND year = %s").format(
                 tbl=tbl_ident
             ),
@@ -263,14 +276,14 @@ def apply_transfer_staff_unit(conn, table_name: str, data: dict):
 
         emp_id, old_dept = row
 
-        cur.execute(
+        execute(
+            cur,
             sql.SQL("UPDATE {tbl} SET dept = %s, updated_at = now() WHERE id = %s").format(
                 tbl=tbl_ident
             ),
             (target_dept, emp_id),
         )
 
-    conn.commit()
     return {
         "employee_id": str(emp_id),
         "table": table_name,
@@ -285,7 +298,8 @@ def apply_exclude_employee_year(conn, table_name: str, data: dict):
     year = int(data["year"])
     tbl_ident = _validate_table_name(table_name)
     with conn.cursor() as cur:
-        cur.execute(
+        execute(
+            cur,
             sql.SQL("UPDATE {tbl} SET include = false, updated_at = now() WHERE name = %s AND year = %s RETURNING id").format(
                 tbl=tbl_ident
             ),
@@ -295,17 +309,37 @@ def apply_exclude_employee_year(conn, table_name: str, data: dict):
         if not row:
             raise ValueError(f"Kein Datensatz für {name} im Jahr {year} in {table_name} gefunden")
         emp_id = row[0]
-    conn.commit()
     return {"employee_id": str(emp_id), "table": table_name, "include": False}
 
 
+def _pnr_select(table_name: str) -> sql.Composable:
+    """
+    Personalnummer-Spalte laut Katalog, immer als personal_number ausgegeben.
+    """
+    pnr_cols = catalog.pnr_columns(table_name)
+    if not pnr_cols:
+        return sql.SQL("NULL AS personal_number")
+    return sql.SQL("{} AS personal_number").format(sql.Identifier(pnr_cols[0]))
+
+
+def _pnr_where(table_name: str, pnr: str):
+    """
+    WHERE-Bedingung nur über die tatsächlich vorhandenen Personalnummer-Spalten.
+    """
+    pnr_cols = catalog.pnr_columns(table_name)
+    if not pnr_cols:
+        raise ValueError(f"{table_name} hat keine Personalnummer-Spalte.")
+    where = "(" + " OR ".join(f"{col} = %s" for col in pnr_cols) + ")"
+    return where, [pnr] * len(pnr_cols)
+
+
 def _fetch_employee_rows(conn, table_name: str, where_clause: str, params: tuple):
     tbl_ident = _validate_table_name(table_name)
     query = sql.SQL(
-        f"SELECT id, name, year, dept, include, personal_number FROM {{tbl}} WHERE {where_clause}"
-    ).format(tbl=tbl_ident)
+        f"SELECT id, name, year, dept, include, {{pnr}} FROM {{tbl}} WHERE {where_clause}"
+    ).format(pnr=_pnr_select(table_name), tbl=tbl_ident)
     with conn.cursor() as cur:
-        cur.execute(query, params)
+        execute(cur, query, params)
         return cur.fetchall(), [c[0] for c in cur.description]
 
 
@@ -361,9 +395,11 @@ def query_employee_vks_year(conn, table_name: str, data: dict):
     year = int(data["year"])
     cols = _month_cols_for_year(year)
     tbl_ident = _validate_table_name(table_name)
+    catalog.ensure_columns(conn, table_name, cols)
     col_ident_list = [sql.Identifier(c) for c in cols]
     with conn.cursor() as cur:
-        cur.execute(
+        execute(
+            cur,
             sql.SQL("SELECT {} FROM {} WHERE LOWER(name)=LOWER(%s) AND year=%s").format(
                 sql.SQL(", ").join(col_ident_list), tbl_ident
             ),
@@ -382,9 +418,11 @@ def query_station_vks_year(conn, table_name: str, data: dict):
     year = int(data["year"])
     cols = _month_cols_for_year(year)
     tbl_ident = _validate_table_name(table_name)
+    catalog.ensure_columns(conn, table_name, cols)
     col_sum = sql.SQL(" + ").join(sql.Identifier(c) for c in cols)
     with conn.cursor() as cur:
-        cur.execute(
+        execute(
+            cur,
             sql.SQL("SELECT SUM({sum_expr}) FROM {tbl} WHERE LOWER(dept)=LOWER(%s) AND year=%s").format(
                 sum_expr=col_sum, tbl=tbl_ident
             ),
@@ -398,9 +436,7 @@ def query_station_vks_year(conn, table_name: str, data: dict):
 def query_employee_by_pnr(conn, table_name: str, data: dict):
     pnr = data["pnr"].strip()
     year = data.get("year")
-    params = [pnr]
-    where = "(personal_number = %s OR personalnumber = %s)"
-    params.append(pnr)
+    where, params = _pnr_where(table_name, pnr)
     if year:
         where += " AND year = %s"
         params.append(year)
@@ -410,7 +446,8 @@ def query_employee_by_pnr(conn, table_name: str, data: dict):
 
 def query_station_by_pnr(conn, table_name: str, data: dict):
     pnr = data["pnr"].strip()
-    rows, cols = _fetch_employee_rows(conn, table_name, "(personal_number = %s OR personalnumber = %s)", (pnr, pnr))
+    where, params = _pnr_where(table_name, pnr)
+    rows, cols = _fetch_employee_rows(conn, table_name, where, tuple(params))
     if not rows:
         return {"pnr": pnr, "found": False}
     recs = [dict(zip(cols, r)) for r in rows]
@@ -423,19 +460,42 @@ def query_employees_site_year(conn, table_name: str, data: dict):
     return {"site_table": table_name, "year": year, "employees": [dict(zip(cols, r)) for r in rows]}
 
 
-def apply_action(conn, table_name: str, parsed: dict, year: Optional[int] = None):
+def apply_action(conn, table_name: str, parsed: dict, year: Optional[int] = None, commit: bool = True):
     """
     Dispatcher: ruft je nach action-Typ die passende Funktion auf.
     year:
       - für Monatsaktionen (VK-Anpassungen) nötig
       - wenn None → heuristisch aktuelles Jahr
+    commit:
+      - False → Aufrufer committet selbst (mehrere Aktionen in einer Transaktion)
     """
+    action = parsed["action"]
+    with timed(INTENT_SECONDS.labels(action), f"action.{action}"):
+        result = _dispatch_action(conn, table_name, parsed, year)
+    if commit:
+        conn.commit()
+    return result
+
+
+def apply_actions(conn, table_name: str, parsed_list: list, year: Optional[int] = None):
+    """
+    Führt mehrere geparste Befehle nacheinander in derselben Transaktion aus.
+    Der Aufrufer committet (oder rollt bei einem Fehler alles zurück).
+    """
+    return [apply_action(conn, table_name, parsed, year=year, commit=False) for parsed in parsed_list]
+
+
+def _dispatch_action(conn, table_name: str, parsed: dict, year: Optional[int]):
     action = parsed["action"]
     data = parsed["data"]
 
     if year is None:
         year = datetime.today().year
 
+    if action != "assistant_help":
+        _validate_table_name(table_name)
+        catalog.ensure_table(conn, table_name)
+
     if action in {"adjust_person_fte_rel", "adjust_person_fte_rel_full"}:
         return apply_adjust_person_fte_rel(conn, table_name, data, year)
     if action in {"adjust_person_fte_abs", "adjust_person_fte_abs_full"}:
@@ -499,6 +559,7 @@ if __name__ == "__main__":
             result = apply_action(conn, table, parsed, year=year)
             print("✅ Ausgeführt:", result)
         except Exception as exc:
+            conn.rollback()
             print("⚠️ Fehler:", exc)
 
     conn.close()
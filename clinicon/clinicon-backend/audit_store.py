@@ -0,0 +1,438 @@
+"""
+assistant_audit als monatlich partitionierte Tabelle (RANGE auf created_at)
+mit automatischer Partitionsanlage, Aufbewahrung/Archivierung alter
+Partitionen und Tages-Rollup je Standort und Aktion.
+
+Die Wartung läuft im App-Prozess (Hintergrund-Thread) oder per Cron:
+  python audit_store.py
+"""
+import gzip
+import logging
+import os
+import re
+import threading
+from datetime import date, datetime, timezone
+from typing import List, Optional
+
+import psycopg2.extras
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Monate, für die Partitionen im Voraus angelegt werden
+AUDIT_PARTITIONS_AHEAD = int(os.getenv("AUDIT_PARTITIONS_AHEAD", "3"))
+# Aufbewahrung der Rohdaten in Monaten (0 = unbegrenzt); das Rollup bleibt erhalten
+AUDIT_RETENTION_MONTHS = int(os.getenv("AUDIT_RETENTION_MONTHS", "0"))
+# Verzeichnis für gzip-CSV-Archive alter Partitionen (leer = ohne Archiv löschen)
+AUDIT_ARCHIVE_DIR = os.getenv("AUDIT_ARCHIVE_DIR", "")
+# Zeitzone für die Tagesgrenzen im Rollup
+AUDIT_ROLLUP_TZ = os.getenv("AUDIT_ROLLUP_TZ", "Europe/Berlin")
+# So viele zurückliegende Tage werden bei jedem Lauf neu aggregiert (der erste
+# Lauf aggregiert den gesamten Bestand)
+AUDIT_ROLLUP_DAYS = int(os.getenv("AUDIT_ROLLUP_DAYS", "2"))
+
+# Advisory-Lock-Schlüssel: Anlage/Migration bzw. Wartung nur in einem Prozess gleichzeitig
+_BOOTSTRAP_LOCK_KEY = 72_210_031
+_MAINTENANCE_LOCK_KEY = 72_210_032
+
+_MONTHLY_PARTITION = re.compile(r"^assistant_audit_y(\d{4})m(\d{2})$")
+
+log = logging.getLogger("clinicon.audit")
+
+
+def _add_months(day: date, months: int) -> date:
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"assistant_audit_y{month.year:04d}m{month.month:02d}"
+
+
+def _relkind(cur, relname: str) -> Optional[str]:
+    cur.execute(
+        """
+        SELECT c.relkind
+        FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE c.relname = %s AND n.nspname = current_schema()
+        """,
+        (relname,),
+    )
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def _create_partitioned_table(cur):
+    cur.execute("CREATE SEQUENCE IF NOT EXISTS assistant_audit_id_seq")
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS assistant_audit (
+          id bigint NOT NULL DEFAULT nextval('assistant_audit_id_seq'),
+          created_at timestamptz NOT NULL DEFAULT now(),
+          site text NOT NULL,
+          command text NOT NULL,
+          action text,
+          target_table text,
+          plan_year int,
+          status text DEFAULT 'ok',
+          result jsonb,
+          PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at);
+        """
+    )
+    cur.execute("ALTER SEQUENCE assistant_audit_id_seq OWNED BY assistant_audit.id")
+
+
+def _migrate_legacy_table(cur):
+    """
+    Bestehende (nicht partitionierte) Tabelle wird als Partition bis Ende des
+    laufenden Monats übernommen – ohne die Zeilen umzukopieren.
+    """
+    cur.execute("ALTER TABLE assistant_audit RENAME TO assistant_audit_legacy")
+    cur.execute("ALTER TABLE assistant_audit_legacy ALTER COLUMN id DROP DEFAULT")
+    cur.execute("UPDATE assistant_audit_legacy SET created_at = 'epoch' WHERE created_at IS NULL")
+    cur.execute("ALTER TABLE assistant_audit_legacy ALTER COLUMN created_at SET NOT NULL")
+    # Partitionen brauchen den Primärschlüssel der Eltern-Tabelle (id, created_at)
+    cur.execute(
+        """
+        ALTER TABLE assistant_audit_legacy
+          DROP CONSTRAINT assistant_audit_pkey,
+          ADD CONSTRAINT assistant_audit_legacy_pkey PRIMARY KEY (id, created_at)
+        """
+    )
+    _create_partitioned_table(cur)
+    next_month = _add_months(date.today().replace(day=1), 1)
+    cur.execute(
+        "ALTER TABLE assistant_audit ATTACH PARTITION assistant_audit_legacy FOR VALUES FROM (MINVALUE) TO (%s)",
+        (next_month,),
+    )
+    log.info("assistant_audit in partitionierte Tabelle überführt (Altbestand bis %s).", next_month)
+
+
+def ensure_audit_table(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_advisory_xact_lock(%s)", (_BOOTSTRAP_LOCK_KEY,))
+        kind = _relkind(cur, "assistant_audit")
+        if kind == "r":
+            _migrate_legacy_table(cur)
+        elif kind is None:
+            _create_partitioned_table(cur)
+        cur.execute(
+            "CREATE TABLE IF NOT EXISTS assistant_audit_default PARTITION OF assistant_audit DEFAULT"
+        )
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS assistant_audit_site_created_idx ON assistant_audit (site, created_at DESC)"
+        )
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS assistant_audit_daily (
+              day date NOT NULL,
+              site text NOT NULL,
+              action text NOT NULL,
+              status text NOT NULL,
+              commands bigint NOT NULL DEFAULT 0,
+              PRIMARY KEY (day, site, action, status)
+            );
+            """
+        )
+        # eine Zeile, sobald der Bestand vollständig ins Rollup übernommen ist
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS assistant_audit_rollup_state (
+              id int PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+              backfilled_at timestamptz NOT NULL DEFAULT now()
+            );
+            """
+        )
+    conn.commit()
+    ensure_partitions(conn)
+
+
+def ensure_partitions(conn, months_ahead: int = AUDIT_PARTITIONS_AHEAD) -> List[str]:
+    """
+    Legt Partitionen für den laufenden und die nächsten Monate an. Bereiche,
+    die schon abgedeckt sind (z. B. Altbestand), werden übersprungen.
+    """
+    created = []
+    this_month = date.today().replace(day=1)
+    with conn.cursor() as cur:
+        for offset in range(months_ahead + 1):
+            start = _add_months(this_month, offset)
+            name = partition_name(start)
+            if _relkind(cur, name):
+                continue
+            cur.execute("SAVEPOINT audit_partition")
+            try:
+                cur.execute(
+                    f"CREATE TABLE {name} PARTITION OF assistant_audit FOR VALUES FROM (%s) TO (%s)",
+                    (start, _add_months(start, 1)),
+                )
+                cur.execute("RELEASE SAVEPOINT audit_partition")
+                created.append(name)
+            except psycopg2.Error as exc:
+                cur.execute("ROLLBACK TO SAVEPOINT audit_partition")
+                log.info("Partition %s nicht angelegt: %s", name, exc.pgerror or exc)
+    conn.commit()
+    return created
+
+
+def write_audit(conn, site: str, command: str, action: Optional[str], target_table: Optional[str], plan_year: Optional[int], status: str, result):
+    """
+    Schreibt einen Audit-Eintrag in der laufenden Transaktion (Commit durch den Aufrufer).
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO assistant_audit(site, command, action, target_table, plan_year, status, result)
+            VALUES (%s,%s,%s,%s,%s,%s,%s)
+            """,
+            (
+                site,
+                command,
+                action,
+                target_table,
+                plan_year,
+                status,
+                psycopg2.extras.Json(result) if result else None,
+            ),
+        )
+
+
+class AuditBuffer:
+    """
+    Sammelt Audit-Einträge, die ohne eigene Datenbankverbindung entstehen
+    (Cache-Treffer), und schreibt sie gebündelt per flush(). Bei mehr als
+    max_rows ungeschriebenen Einträgen werden die ältesten verworfen.
+    """
+
+    def __init__(self, max_rows: int = 10_000):
+        self.max_rows = max_rows
+        self.dropped = 0
+        self._rows = []
+        self._lock = threading.Lock()
+
+    def add(self, site: str, command: str, action: Optional[str], target_table: Optional[str], plan_year: Optional[int], status: str, result):
+        row = (datetime.now(timezone.utc), site, command, action, target_table, plan_year, status, psycopg2.extras.Json(result) if result else None)
+        with self._lock:
+            self._rows.append(row)
+            if len(self._rows) > self.max_rows:
+                overflow = len(self._rows) - self.max_rows
+                del self._rows[:overflow]
+                self.dropped += overflow
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._rows)
+
+    def flush(self, conn) -> int:
+        with self._lock:
+            rows, self._rows = self._rows, []
+        if not rows:
+            return 0
+        try:
+            with conn.cursor() as cur:
+                psycopg2.extras.execute_values(
+                    cur,
+                    """
+                    INSERT INTO assistant_audit(created_at, site, command, action, target_table, plan_year, status, result)
+                    VALUES %s
+                    """,
+                    rows,
+                )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            with self._lock:
+                self._rows[:0] = rows
+                del self._rows[: max(0, len(self._rows) - self.max_rows)]
+            raise
+        return len(rows)
+
+
+def _rollup_days(cur, first: Optional[date] = None, last: Optional[date] = None) -> int:
+    """
+    Aggregiert die Tage first … last (AUDIT_ROLLUP_TZ, offen = ohne Grenze)
+    in assistant_audit_daily. Teilbefehle zusammengesetzter Befehle zählen je
+    Aktion. Das Audit wächst nur; GREATEST verhindert, dass ein Tag, dessen
+    Rohdaten teilweise schon gelöscht sind, mit einer kleineren Zahl
+    überschrieben wird.
+    """
+    cur.execute(
+        """
+        INSERT INTO assistant_audit_daily (day, site, action, status, commands)
+        SELECT (a.created_at AT TIME ZONE %(tz)s)::date AS day,
+               a.site,
+               COALESCE(item->>'action', a.action, '') AS action,
+               COALESCE(a.status, 'ok') AS status,
+               count(*) AS commands
+        FROM assistant_audit a
+        LEFT JOIN LATERAL jsonb_array_elements(
+          CASE WHEN a.action = 'compound' AND jsonb_typeof(a.result->'items') = 'array'
+               THEN a.result->'items' END
+        ) AS item ON true
+        WHERE (%(first)s::date IS NULL OR a.created_at >= %(first)s::date::timestamp AT TIME ZONE %(tz)s)
+          AND (%(last)s::date IS NULL OR a.created_at < (%(last)s::date + 1)::timestamp AT TIME ZONE %(tz)s)
+        GROUP BY 1, 2, 3, 4
+        ON CONFLICT (day, site, action, status)
+        DO UPDATE SET commands = GREATEST(assistant_audit_daily.commands, EXCLUDED.commands)
+        """,
+        {"tz": AUDIT_ROLLUP_TZ, "first": first, "last": last},
+    )
+    return cur.rowcount
+
+
+def _rollup_before_removal(cur, relation: str, condition: str = "true", params: tuple = ()) -> int:
+    """
+    Aggregiert alle Tage, die Zeilen aus relation berühren, bevor diese
+    archiviert und gelöscht werden.
+    """
+    cur.execute(
+        f"""
+        SELECT min((created_at AT TIME ZONE %s)::date), max((created_at AT TIME ZONE %s)::date)
+        FROM {relation} WHERE {condition}
+        """,
+        (AUDIT_ROLLUP_TZ, AUDIT_ROLLUP_TZ) + params,
+    )
+    first, last = cur.fetchone()
+    if first is None:
+        return 0
+    return _rollup_days(cur, first, last)
+
+
+def refresh_rollup(conn, days: int = AUDIT_ROLLUP_DAYS) -> int:
+    """
+    Aggregiert die letzten days Tage neu in assistant_audit_daily; beim ersten
+    Lauf (noch kein Eintrag in assistant_audit_rollup_state) den gesamten
+    Bestand.
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT 1 FROM assistant_audit_rollup_state")
+        backfill = cur.fetchone() is None
+        if backfill:
+            first = None
+        else:
+            cur.execute("SELECT (now() AT TIME ZONE %s)::date - %s", (AUDIT_ROLLUP_TZ, max(days - 1, 0)))
+            first = cur.fetchone()[0]
+        count = _rollup_days(cur, first)
+        if backfill:
+            cur.execute("INSERT INTO assistant_audit_rollup_state DEFAULT VALUES ON CONFLICT DO NOTHING")
+            log.info("Audit-Rollup für den gesamten Bestand erstellt (%s Zeilen).", count)
+    conn.commit()
+    return count
+
+
+def _archive_query(cur, query: str, archive_dir: str, filename: str) -> str:
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, filename)
+    tmp_path = path + ".tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as fh:
+        cur.copy_expert(f"COPY ({query}) TO STDOUT WITH CSV HEADER", fh)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _archive_partition(cur, name: str, archive_dir: str) -> str:
+    return _archive_query(cur, f"SELECT * FROM {name} ORDER BY created_at", archive_dir, f"{name}.csv.gz")
+
+
+def _purge_default_partition(cur, cutoff: date, archive_dir: str) -> int:
+    """
+    Nachzügler in der Default-Partition; mit archive_dir vorher gesichert
+    (eine Datei je Lauf, da die Partition bestehen bleibt).
+    """
+    cur.execute("SELECT count(*) FROM assistant_audit_default WHERE created_at < %s", (cutoff,))
+    count = cur.fetchone()[0]
+    if not count:
+        return 0
+    _rollup_before_removal(cur, "assistant_audit_default", "created_at < %s", (cutoff,))
+    if archive_dir:
+        query = cur.mogrify(
+            "SELECT * FROM assistant_audit_default WHERE created_at < %s ORDER BY created_at", (cutoff,)
+        ).decode("utf-8")
+        filename = f"assistant_audit_default_{datetime.now():%Y%m%dT%H%M%S}.csv.gz"
+        path = _archive_query(cur, query, archive_dir, filename)
+        log.info("%s Zeilen aus assistant_audit_default archiviert nach %s", count, path)
+    cur.execute("DELETE FROM assistant_audit_default WHERE created_at < %s", (cutoff,))
+    return cur.rowcount
+
+
+def apply_retention(conn, retention_months: int = AUDIT_RETENTION_MONTHS, archive_dir: str = AUDIT_ARCHIVE_DIR) -> List[str]:
+    """
+    Entfernt Partitionen, die vollständig vor der Aufbewahrungsgrenze liegen;
+    ihre Tage werden vorher ins Rollup übernommen und mit archive_dir als
+    gzip-CSV gesichert.
+    """
+    if retention_months <= 0:
+        return []
+    cutoff = _add_months(date.today().replace(day=1), -retention_months)
+    dropped = []
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT c.relname
+            FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'assistant_audit'::regclass
+            """
+        )
+        partitions = [row[0] for row in cur.fetchall()]
+        for name in sorted(partitions):
+            match = _MONTHLY_PARTITION.match(name)
+            if match:
+                expired = _add_months(date(int(match.group(1)), int(match.group(2)), 1), 1) <= cutoff
+            elif name == "assistant_audit_legacy":
+                cur.execute("SELECT max(created_at)::date FROM assistant_audit_legacy")
+                newest = cur.fetchone()[0]
+                expired = newest is None or newest < cutoff
+            else:
+                continue
+            if not expired:
+                continue
+            _rollup_before_removal(cur, name)
+            if archive_dir:
+                path = _archive_partition(cur, name, archive_dir)
+                log.info("Partition %s archiviert nach %s", name, path)
+            cur.execute(f"ALTER TABLE assistant_audit DETACH PARTITION {name}")
+            cur.execute(f"DROP TABLE {name}")
+            conn.commit()
+            dropped.append(name)
+        _purge_default_partition(cur, cutoff, archive_dir)
+    conn.commit()
+    return dropped
+
+
+def run_maintenance(conn) -> dict:
+    """
+    Partitionen anlegen, Rollup auffrischen, Aufbewahrung anwenden. Läuft
+    prozessübergreifend nur einmal gleichzeitig (Advisory Lock).
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_try_advisory_lock(%s)", (_MAINTENANCE_LOCK_KEY,))
+        if not cur.fetchone()[0]:
+            conn.rollback()
+            return {"skipped": True}
+    try:
+        return {
+            "created": ensure_partitions(conn),
+            "rollup_rows": refresh_rollup(conn),
+            "dropped": apply_retention(conn),
+        }
+    finally:
+        conn.rollback()
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_unlock(%s)", (_MAINTENANCE_LOCK_KEY,))
+        conn.commit()
+
+
+if __name__ == "__main__":
+    import psycopg2
+
+    logging.basicConfig(level=logging.INFO)
+    db_url = os.getenv("DATABASE_URL")
+    if not db_url:
+        raise SystemExit("DATABASE_URL fehlt (siehe .env.example)")
+    conn = psycopg2.connect(db_url)
+    try:
+        ensure_audit_table(conn)
+        print(run_maintenance(conn))
+    finally:
+        conn.close()
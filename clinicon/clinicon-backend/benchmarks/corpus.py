@@ -0,0 +1,67 @@
+"""
+Befehlskorpus für Benchmarks und Last-Tests.
+Platzhalter: {name}, {dept}, {pnr}, {year}, {month}, {site}
+"""
+import random
+from typing import Dict, List
+
+# Ein Template je Intent aus text_parser.INTENT_PATTERN_SOURCES
+INTENT_TEMPLATES: Dict[str, str] = {
+    "adjust_person_fte_rel_full": "Mitarbeiter {name} möchte zum {month} {year} seinen Stellenanteil um 0,25 VK reduzieren",
+    "adjust_person_fte_rel_missing_name": "Ein Mitarbeiter möchte zum {month} {year} seinen Stellenanteil um 0,5 VK erhöhen",
+    "adjust_person_fte_abs_full": "Setze {name} ab {month} {year} auf 0,8 VK",
+    "check_employee_works_here": "Arbeitet {name} hier?",
+    "get_employee_station": "Auf welcher Station arbeitet {name}?",
+    "list_employees_on_station": "Wer ist auf {dept} im Jahr {year}?",
+    "get_employee_vks_year": "Wie viele VK hat {name} im Jahr {year}?",
+    "get_station_vks_year": "Wie viele VK sind auf {dept} im Jahr {year} geplant?",
+    "move_employee_to_station_year": "Versetze {name} ab {year} auf {dept}",
+    "adjust_person_fte_range": "Reduziere {name} vom 01.03.{year} bis 30.06.{year} um 0,2 VK wegen Elternzeit",
+    "exclude_employee_year": "Nimm {name} im Jahr {year} aus der Planung raus",
+    "check_employee_by_personal_number": "Gibt es einen Mitarbeiter mit der Personalnummer {pnr} im Stellenplan {year}?",
+    "get_station_by_personal_number": "Auf welcher Station arbeitet der Mitarbeiter mit der Personalnummer {pnr}?",
+    "list_employees_site_year": "Zeig mir alle Mitarbeiter vom Standort {site} im Jahr {year}",
+    "assistant_help": "Was kann der Stellenplan-Assistent?",
+}
+
+COMPOUND_TEMPLATES: List[str] = [
+    "Setze {name} ab {month} {year} auf 0,5 VK und versetze {name} ab {year} auf {dept}",
+    "Wie viele VK hat {name} im Jahr {year}? Wie viele VK sind auf {dept} im Jahr {year} geplant?",
+    "Setze {name} ab {month} {year} auf 1 VK; nimm {name} im Jahr {year} aus der Planung raus",
+]
+
+UNRECOGNIZED = [
+    "Bitte den Dienstplan für nächste Woche ausdrucken",
+    "Wann ist die nächste Teambesprechung auf Station 4?",
+]
+
+SAMPLE_NAMES = ["Meier", "Schulz", "Anna Becker", "Hans Möller", "Jürgen Weiß", "Özlem Yılmaz"]
+SAMPLE_DEPTS = ["Station 3", "Station 12", "Intensivstation", "IMC"]
+MONTHS = ["Januar", "Februar", "März", "April", "Mai", "Juni", "Juli", "August", "September", "Oktober", "November", "Dezember"]
+
+
+def fill(template: str, rng: random.Random, **overrides) -> str:
+    values = {
+        "name": rng.choice(SAMPLE_NAMES),
+        "dept": rng.choice(SAMPLE_DEPTS),
+        "pnr": str(rng.randint(100000, 999999)),
+        "year": rng.choice([2026, 2027, 2028]),
+        "month": rng.choice(MONTHS),
+        "site": "GFODIN",
+    }
+    values.update(overrides)
+    return template.format(**values)
+
+
+def parser_corpus(seed: int = 42, per_intent: int = 20) -> Dict[str, List[str]]:
+    """
+    Befehle je Intent (plus "compound" und "unrecognized") für Parser-Benchmarks.
+    """
+    rng = random.Random(seed)
+    corpus = {
+        intent: [fill(template, rng) for _ in range(per_intent)]
+        for intent, template in INTENT_TEMPLATES.items()
+    }
+    corpus["compound"] = [fill(rng.choice(COMPOUND_TEMPLATES), rng) for _ in range(per_intent)]
+    corpus["unrecognized"] = [rng.choice(UNRECOGNIZED) for _ in range(per_intent)]
+    return corpus
@@ -0,0 +1,267 @@
+"""
+Last-Replay gegen eine laufende Instanz: spielt Befehle aus assistant_audit
+(oder einen synthetischen Korpus) mit einstellbarer Parallelität und
+Beschleunigung ab und misst Latenzen je Intent und Endpoint.
+
+  python -m benchmarks.replay --base-url http://127.0.0.1:8000 --concurrency 100 --speedup 20
+  python -m benchmarks.replay --synthetic 2000 --concurrency 100 --ai-ratio 0.2 --start-stub
+
+Achtung: Schreibbefehle werden wirklich ausgeführt → nur gegen Test-Instanzen.
+Für /api/ai-command die Instanz mit OPENAI_BASE_URL=http://127.0.0.1:8089/v1
+starten (siehe benchmarks.stub_openai, --start-stub startet ihn hier mit).
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from text_parser import parse_commands
+
+from benchmarks.corpus import COMPOUND_TEMPLATES, INTENT_TEMPLATES, fill
+
+
+def load_audit_events(database_url: str, since_days: int, limit: int) -> List[Dict[str, Any]]:
+    """
+    Befehle aus assistant_audit mit ihren ursprünglichen Zeitabständen.
+    """
+    import psycopg2
+
+    conn = psycopg2.connect(database_url)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT created_at, site, command, target_table, plan_year
+                FROM assistant_audit
+                WHERE created_at >= now() - make_interval(days => %s)
+                  AND target_table IS NOT NULL
+                ORDER BY created_at
+                LIMIT %s
+                """,
+                (since_days, limit),
+            )
+            rows = cur.fetchall()
+    finally:
+        conn.close()
+    if not rows:
+        return []
+    first = rows[0][0]
+    return [
+        {
+            "offset": (created_at - first).total_seconds(),
+            "command": command,
+            "table": table,
+            "year": plan_year,
+            "site": site,
+        }
+        for created_at, site, command, table, plan_year in rows
+    ]
+
+
+def synthetic_events(count: int, rate: float, tables: List[str], seed: int = 42) -> List[Dict[str, Any]]:
+    """
+    Synthetische Last: Poisson-Ankünfte mit rate Befehlen/Sekunde.
+    """
+    rng = random.Random(seed)
+    templates = list(INTENT_TEMPLATES.values()) + COMPOUND_TEMPLATES
+    events = []
+    offset = 0.0
+    for _ in range(count):
+        offset += rng.expovariate(rate)
+        table = rng.choice(tables)
+        events.append(
+            {
+                "offset": offset,
+                "command": fill(rng.choice(templates), rng),
+                "table": table,
+                "year": rng.choice([2026, 2027, 2028]),
+                "site": table.rsplit("_", 1)[-1].upper(),
+            }
+        )
+    return events
+
+
+def _intent_of(command: str) -> str:
+    items = parse_commands(command)
+    if len(items) > 1:
+        return "compound"
+    if items and items[0]["action"]:
+        return items[0]["action"]
+    return "unrecognized"
+
+
+def _post(url: str, payload: Dict[str, Any], timeout: float) -> int:
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as exc:
+        exc.read()
+        return exc.code
+
+
+class Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples: Dict[str, Dict[str, List[float]]] = {"endpoint": {}, "intent": {}}
+        self.errors: Dict[str, Dict[str, int]] = {"endpoint": {}, "intent": {}}
+        self.status_codes: Dict[int, int] = {}
+        self.max_lag = 0.0
+
+    def record(self, endpoint: str, intent: str, latency: float, status: int, lag: float):
+        failed = status == 0 or status >= 400
+        with self._lock:
+            for kind, key in (("endpoint", endpoint), ("intent", intent)):
+                self.samples[kind].setdefault(key, []).append(latency)
+                self.errors[kind][key] = self.errors[kind].get(key, 0) + (1 if failed else 0)
+            self.status_codes[status] = self.status_codes.get(status, 0) + 1
+            self.max_lag = max(self.max_lag, lag)
+
+    def summary(self, wall_seconds: float) -> Dict[str, Any]:
+        def describe(values: List[float], errors: int) -> Dict[str, Any]:
+            values = sorted(values)
+
+            def pct(p: float) -> float:
+                return round(values[min(len(values) - 1, int(len(values) * p))] * 1000, 2)
+
+            return {
+                "requests": len(values),
+                "errors": errors,
+                "error_rate": round(errors / len(values), 4),
+                "throughput_rps": round(len(values) / wall_seconds, 2) if wall_seconds else None,
+                "p50_ms": pct(0.50),
+                "p95_ms": pct(0.95),
+                "p99_ms": pct(0.99),
+                "max_ms": round(values[-1] * 1000, 2),
+            }
+
+        total = sum(len(v) for v in self.samples["endpoint"].values())
+        total_errors = sum(self.errors["endpoint"].values())
+        return {
+            "wall_seconds": round(wall_seconds, 3),
+            "requests": total,
+            "throughput_rps": round(total / wall_seconds, 2) if wall_seconds else None,
+            "error_rate": round(total_errors / total, 4) if total else None,
+            "max_schedule_lag_ms": round(self.max_lag * 1000, 2),
+            "status_codes": {str(k): v for k, v in sorted(self.status_codes.items())},
+            "per_endpoint": {k: describe(v, self.errors["endpoint"][k]) for k, v in sorted(self.samples["endpoint"].items())},
+            "per_intent": {k: describe(v, self.errors["intent"][k]) for k, v in sorted(self.samples["intent"].items())},
+        }
+
+
+def replay(events: List[Dict[str, Any]], base_url: str, concurrency: int, speedup: float, ai_ratio: float, timeout: float, seed: int = 42) -> Dict[str, Any]:
+    """
+    Sendet die Events zu ihrem (beschleunigten) Zeitpunkt; speedup <= 0 → so schnell wie möglich.
+    Die Latenz zählt ab dem geplanten Zeitpunkt, enthält also auch die Wartezeit,
+    bis ein Worker frei ist (bei speedup <= 0 gibt es keinen Plan → ab Sendebeginn).
+    """
+    rng = random.Random(seed)
+    stats = Stats()
+    base_url = base_url.rstrip("/")
+
+    def send(event: Dict[str, Any], scheduled: float):
+        lag = max(0.0, time.perf_counter() - scheduled)
+        if event["endpoint"] == "/api/ai-command":
+            payload = {"command": event["command"]}
+        else:
+            payload = {"command": event["command"], "table": event["table"], "year": event["year"], "site": event["site"]}
+        start = scheduled if speedup > 0 else time.perf_counter()
+        try:
+            status = _post(base_url + event["endpoint"], payload, timeout)
+        except Exception:
+            status = 0
+        stats.record(event["endpoint"], event["intent"], time.perf_counter() - start, status, lag)
+
+    for event in events:
+        event["endpoint"] = "/api/ai-command" if rng.random() < ai_ratio else "/api/command"
+        event["intent"] = _intent_of(event["command"])
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for event in events:
+            scheduled = started + (event["offset"] / speedup if speedup > 0 else 0.0)
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(send, event, scheduled)
+    return stats.summary(time.perf_counter() - started)
+
+
+def _print_table(title: str, rows: Dict[str, Dict[str, Any]]):
+    print(f"\n{title}")
+    print(f"{'':40} {'n':>7} {'err%':>7} {'rps':>8} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for key, row in rows.items():
+        print(
+            f"{key:40} {row['requests']:>7} {row['error_rate'] * 100:>6.1f}% {row['throughput_rps'] or 0:>8.1f} "
+            f"{row['p50_ms']:>8.1f}ms {row['p95_ms']:>8.1f}ms {row['p99_ms']:>8.1f}ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Last-Replay gegen eine laufende CliniCon-Instanz")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--database-url", default=os.getenv("REPLAY_DATABASE_URL") or os.getenv("DATABASE_URL"), help="Quelle für assistant_audit")
+    parser.add_argument("--since-days", type=int, default=30)
+    parser.add_argument("--limit", type=int, default=5000)
+    parser.add_argument("--synthetic", type=int, default=0, help="Anzahl synthetischer Befehle (statt/ohne Audit-Historie)")
+    parser.add_argument("--rate", type=float, default=20.0, help="synthetische Ankunftsrate (Befehle/s)")
+    parser.add_argument("--tables", nargs="*", default=["stellenplan_employees_gfodin"])
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--speedup", type=float, default=1.0, help="0 = ohne Pausen")
+    parser.add_argument("--ai-ratio", type=float, default=0.0, help="Anteil der Befehle an /api/ai-command")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--start-stub", action="store_true", help="OpenAI-Stub lokal mitstarten")
+    parser.add_argument("--stub-port", type=int, default=8089)
+    parser.add_argument("--stub-latency-ms", type=float, default=300.0)
+    parser.add_argument("--output", help="Ergebnis als JSON")
+    args = parser.parse_args()
+
+    events: List[Dict[str, Any]] = []
+    source = "synthetic"
+    if not args.synthetic and args.database_url:
+        events = load_audit_events(args.database_url, args.since_days, args.limit)
+        source = "assistant_audit"
+    if not events:
+        events = synthetic_events(args.synthetic or 1000, args.rate, args.tables)
+        source = "synthetic"
+
+    stub: Optional[Any] = None
+    if args.start_stub:
+        from benchmarks.stub_openai import serve
+
+        stub = serve(port=args.stub_port, latency_ms=args.stub_latency_ms)
+
+    try:
+        summary = replay(events, args.base_url, args.concurrency, args.speedup, args.ai_ratio, args.timeout)
+    finally:
+        if stub:
+            stub.shutdown()
+
+    summary["source"] = source
+    summary["concurrency"] = args.concurrency
+    summary["speedup"] = args.speedup
+    print(
+        f"{summary['requests']} Anfragen aus {source} in {summary['wall_seconds']}s "
+        f"({summary['throughput_rps']} rps, Fehlerquote {summary['error_rate']})"
+    )
+    _print_table("Je Endpoint", summary["per_endpoint"])
+    _print_table("Je Intent", summary["per_intent"])
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(summary, fh, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
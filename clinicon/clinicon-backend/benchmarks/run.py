@@ -0,0 +1,231 @@
+"""
+Benchmark-Suite für text_parser und apply_actions.
+
+  python -m benchmarks.run                               # nur Parser
+  python -m benchmarks.run --db                          # + DB (BENCH_DATABASE_URL, vorher benchmarks.seed)
+  python -m benchmarks.run --save-baseline               # Ergebnis als Baseline speichern
+  python -m benchmarks.run --output results.json         # maschinenlesbares Ergebnis
+
+Regressionen (Median > Baseline × (1 + threshold)) und fehlgeschlagene
+Verzweigungen führen zu Exit-Code 1. benchmarks/baseline.json enthält die
+Referenzwerte (Parser und DB gegen benchmarks.seed mit --employees 500);
+stimmen Plattform oder Python-Version nicht mit der Baseline überein, wird
+der Vergleich mit einer Warnung übersprungen. Nach Änderungen an Hardware
+oder Seed mit --save-baseline neu erzeugen.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+from text_parser import get_intent_patterns, parse_command, parse_commands
+
+from benchmarks.corpus import INTENT_TEMPLATES, parser_corpus
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+def measure(func: Callable[[], object], iterations: int, warmup: int = 3, setup: Callable[[], object] = None) -> Dict[str, float]:
+    """
+    Führt func iterations-mal aus; Zeiten in Mikrosekunden.
+    setup wird vor jedem Lauf außerhalb der Messung aufgerufen.
+    """
+    for _ in range(warmup):
+        if setup:
+            setup()
+        func()
+    timings = []
+    for _ in range(iterations):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1e6)
+    timings.sort()
+    return {
+        "iterations": iterations,
+        "min_us": round(timings[0], 3),
+        "median_us": round(statistics.median(timings), 3),
+        "p95_us": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+        "mean_us": round(statistics.fmean(timings), 3),
+        "stdev_us": round(statistics.pstdev(timings), 3),
+    }
+
+
+def bench_parser(iterations: int) -> Dict[str, Dict[str, float]]:
+    corpus = parser_corpus()
+    results = {}
+    for intent, commands in corpus.items():
+        if intent == "compound":
+            func = lambda cmds=commands: [parse_commands(c) for c in cmds]
+        else:
+            func = lambda cmds=commands: [parse_command(c) for c in cmds]
+        stats = measure(func, iterations)
+        # pro Befehl normieren
+        for key in ("min_us", "median_us", "p95_us", "mean_us", "stdev_us"):
+            stats[key] = round(stats[key] / len(commands), 3)
+        results[f"parser/{intent}"] = stats
+    all_commands = [c for cmds in corpus.values() for c in cmds]
+    stats = measure(lambda: [parse_commands(c) for c in all_commands], max(1, iterations // 5))
+    stats["commands"] = len(all_commands)
+    results["parser/corpus_total"] = stats
+    return results
+
+
+def _sample_employee(conn, table: str) -> Dict[str, object]:
+    from psycopg2 import sql
+
+    with conn.cursor() as cur:
+        cur.execute(
+            sql.SQL("SELECT name, year, dept, personal_number FROM {} WHERE year = 2027 AND include ORDER BY id LIMIT 1").format(
+                sql.Identifier(table)
+            )
+        )
+        name, year, dept, pnr = cur.fetchone()
+    return {"name": name, "year": year, "dept": dept, "pnr": pnr, "month": "März", "site": table.rsplit("_", 1)[-1].upper()}
+
+
+def _parse_as(intent: str, text: str) -> Dict[str, object]:
+    """
+    Parst text direkt mit dem Pattern des Intents, damit auch Zweige gemessen
+    werden, die in parse_command von früheren Patterns verdeckt sind.
+    """
+    for name, pattern in get_intent_patterns():
+        if name == intent:
+            match = pattern.search(text.strip())
+            if match:
+                return {"intent": intent, "action": intent, "data": match.groupdict()}
+    raise RuntimeError(f"Korpus-Befehl für {intent} wird nicht erkannt.")
+
+
+def bench_db(database_url: str, table: str, iterations: int) -> Dict[str, Dict[str, float]]:
+    """
+    Jede apply_action-Verzweigung gegen die Seed-Daten; Schreibaktionen werden
+    nach jedem Lauf zurückgerollt, damit alle Läufe dieselben Daten sehen.
+    Schlägt eine Verzweigung fehl, steht der Fehler in ihrem Ergebnis und die
+    übrigen laufen weiter.
+    """
+    import psycopg2
+
+    from apply_actions import apply_action
+    from schema_catalog import catalog
+    from statements import PreparingConnection
+
+    conn = psycopg2.connect(database_url, connection_factory=PreparingConnection)
+    results = {}
+    try:
+        catalog.load(conn)
+        conn.commit()
+        values = _sample_employee(conn, table)
+        conn.rollback()
+        for intent, template in INTENT_TEMPLATES.items():
+            if intent == "adjust_person_fte_rel_missing_name":
+                continue  # wirft immer ValueError, kein DB-Zugriff
+            parsed = _parse_as(intent, template.format(**values))
+
+            def run(parsed=parsed):
+                apply_action(conn, table, parsed, year=values["year"], commit=False)
+
+            try:
+                results[f"db/{intent}"] = measure(run, iterations, setup=conn.rollback)
+            except Exception as exc:
+                results[f"db/{intent}"] = {"error": f"{type(exc).__name__}: {exc}"}
+            conn.rollback()
+    finally:
+        conn.close()
+    return results
+
+
+def run_meta(threshold: float) -> Dict[str, object]:
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "threshold": threshold,
+    }
+
+
+def compare(results: Dict[str, Dict], baseline_report: Dict, meta: Dict[str, object], threshold: float) -> List[Dict[str, object]]:
+    """
+    Vergleicht mit einer Baseline derselben Maschine. Weichen Plattform oder
+    Python-Version ab, sind die Zeiten nicht vergleichbar: Warnung statt
+    Regressionen.
+    """
+    base_meta = baseline_report.get("meta", {})
+    mismatched = [key for key in ("platform", "python") if base_meta.get(key) != meta[key]]
+    if mismatched:
+        details = ", ".join(f"{key} {base_meta.get(key)!r} ≠ {meta[key]!r}" for key in mismatched)
+        print(f"WARNUNG: Baseline von anderer Umgebung ({details}), Vergleich übersprungen; ggf. --save-baseline.", file=sys.stderr)
+        return []
+
+    baseline = baseline_report.get("results", {})
+    regressions = []
+    for name, stats in results.items():
+        base = baseline.get(name)
+        if "error" in stats or not base or not base.get("median_us"):
+            continue
+        ratio = stats["median_us"] / base["median_us"]
+        stats["baseline_median_us"] = base["median_us"]
+        stats["ratio"] = round(ratio, 3)
+        if ratio > 1 + threshold:
+            regressions.append({"benchmark": name, "ratio": round(ratio, 3), "median_us": stats["median_us"], "baseline_median_us": base["median_us"]})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CliniCon Benchmarks")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--db", action="store_true", help="DB-Benchmarks gegen BENCH_DATABASE_URL")
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"))
+    parser.add_argument("--table", default="stellenplan_employees_gfodin")
+    parser.add_argument("--db-iterations", type=int, default=50)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--threshold", type=float, default=0.25, help="erlaubte Verlangsamung (0.25 = +25 %%)")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--output", help="Ergebnis-JSON (Standard: stdout)")
+    args = parser.parse_args()
+
+    results = bench_parser(args.iterations)
+    if args.db:
+        if not args.database_url:
+            raise SystemExit("BENCH_DATABASE_URL bzw. --database-url fehlt (nur lokale Benchmark-DB!).")
+        results.update(bench_db(args.database_url, args.table, args.db_iterations))
+
+    meta = run_meta(args.threshold)
+    regressions = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            regressions = compare(results, json.load(fh), meta, args.threshold)
+
+    report = {
+        "meta": meta,
+        "results": results,
+        "regressions": regressions,
+        "errors": {name: stats["error"] for name, stats in results.items() if "error" in stats},
+    }
+    payload = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(payload + "\n")
+    else:
+        print(payload)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as fh:
+            fh.write(payload + "\n")
+        print(f"Baseline gespeichert: {args.baseline}", file=sys.stderr)
+
+    for reg in regressions:
+        print(f"REGRESSION {reg['benchmark']}: {reg['ratio']}× Baseline", file=sys.stderr)
+    for name, error in report["errors"].items():
+        print(f"FEHLER {name}: {error}", file=sys.stderr)
+    sys.exit(1 if regressions or report["errors"] else 0)
+
+
+if __name__ == "__main__":
+    main()
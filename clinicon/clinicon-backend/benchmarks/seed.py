@@ -0,0 +1,182 @@
+"""
+Synthetischer Stellenplan: legt die 19 Tabellen stellenplan_employees_<site>
+mit Monats-Spalten jan_2026 … dez_2031 an und befüllt sie per COPY.
+
+  python -m benchmarks.seed --database-url postgresql://localhost/clinicon_bench --employees 500 --drop
+
+NUR gegen eine lokale Benchmark-Datenbank ausführen (BENCH_DATABASE_URL).
+"""
+import argparse
+import io
+import os
+import random
+from decimal import Decimal
+from typing import Dict, List
+
+import psycopg2
+from psycopg2 import sql
+
+from apply_actions import MONTH_ORDER, VALID_PLAN_YEARS
+
+# Standorte wie in scripts/stellenplan_union_view.sql
+SITES = [
+    "admin", "gfobah", "gfoben", "gfober", "gfobeu", "gfobru", "gfodin", "gfodui", "gfoeng", "gfohil",
+    "gfolan", "gfolen", "gfomoe", "gfoolp", "gforhe", "gfosie", "gfotro", "gfowis", "gfozpd",
+]
+
+PLAN_YEARS = sorted(VALID_PLAN_YEARS)
+MONTH_COLUMNS = [f"{m}_{y}" for y in PLAN_YEARS for m in MONTH_ORDER]
+
+FIRST_NAMES = [
+    "Anna", "Hans", "Jürgen", "Özlem", "Maria", "Thomas", "Sabine", "Stefan", "Katrin", "Michael",
+    "Petra", "Andreas", "Julia", "Frank", "Claudia", "Markus", "Nicole", "Lukas", "Sarah", "Jan",
+]
+LAST_NAMES = [
+    "Meier", "Schulz", "Becker", "Möller", "Weiß", "Yılmaz", "Müller", "Schmidt", "Schneider", "Fischer",
+    "Wagner", "Hoffmann", "Koch", "Richter", "Klein", "Wolf", "Schröder", "Neumann", "Schwarz", "Zimmermann",
+]
+DEPTS = [f"Station {i}" for i in range(1, 13)] + ["Intensivstation", "IMC", "Notaufnahme", "OP", "Ambulanz"]
+TYPICAL_FTE = [Decimal("1.0")] * 6 + [Decimal("0.75"), Decimal("0.5"), Decimal("0.8"), Decimal("0.6")]
+
+
+def table_name(site: str) -> str:
+    return f"stellenplan_employees_{site}"
+
+
+def create_table(cur, site: str, drop: bool = False):
+    tbl = sql.Identifier(table_name(site))
+    if drop:
+        cur.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(tbl))
+    month_defs = sql.SQL(", ").join(
+        sql.SQL("{} numeric(6,3)").format(sql.Identifier(col)) for col in MONTH_COLUMNS
+    )
+    cur.execute(
+        sql.SQL(
+            """
+            CREATE TABLE IF NOT EXISTS {tbl} (
+              id bigserial PRIMARY KEY,
+              name text NOT NULL,
+              year int NOT NULL,
+              dept text,
+              include boolean DEFAULT true,
+              personal_number text,
+              updated_at timestamptz DEFAULT now(),
+              {months}
+            )
+            """
+        ).format(tbl=tbl, months=month_defs)
+    )
+
+
+def _month_values(rng: random.Random) -> List[Decimal]:
+    """
+    Realistischer Verlauf über alle Planjahre: meist konstant, gelegentlich
+    Wechsel des Stellenanteils oder Elternzeit (0 VK).
+    """
+    fte = rng.choice(TYPICAL_FTE)
+    values = []
+    for _ in MONTH_COLUMNS:
+        roll = rng.random()
+        if roll < 0.01:
+            fte = rng.choice(TYPICAL_FTE)
+        elif roll < 0.012:
+            fte = Decimal("0")
+        elif fte == 0 and roll < 0.1:
+            fte = rng.choice(TYPICAL_FTE)
+        values.append(fte)
+    return values
+
+
+def generate_rows(site: str, employees: int, seed: int = 42) -> List[Dict]:
+    """
+    Eine Zeile je Mitarbeiter und Planjahr; Namen sind je Standort eindeutig.
+    """
+    rng = random.Random(f"{seed}-{site}")
+    rows = []
+    used_names = set()
+    for idx in range(employees):
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        if name in used_names:
+            name = f"{name} {idx}"
+        used_names.add(name)
+        pnr = str(100000 + idx)
+        dept = rng.choice(DEPTS)
+        months = _month_values(rng)
+        for year in PLAN_YEARS:
+            if rng.random() < 0.05:
+                dept = rng.choice(DEPTS)
+            rows.append(
+                {
+                    "name": name,
+                    "year": year,
+                    "dept": dept,
+                    "include": rng.random() > 0.02,
+                    "personal_number": pnr,
+                    "months": months,
+                }
+            )
+    return rows
+
+
+def copy_rows(cur, site: str, rows: List[Dict]):
+    buf = io.StringIO()
+    for row in rows:
+        fields = [row["name"], str(row["year"]), row["dept"], "t" if row["include"] else "f", row["personal_number"]]
+        fields.extend(str(v) for v in row["months"])
+        buf.write("\t".join(fields) + "\n")
+    buf.seek(0)
+    columns = ["name", "year", "dept", "include", "personal_number"] + MONTH_COLUMNS
+    cur.copy_expert(
+        sql.SQL("COPY {} ({}) FROM STDIN").format(
+            sql.Identifier(table_name(site)),
+            sql.SQL(", ").join(sql.Identifier(c) for c in columns),
+        ).as_string(cur.connection),
+        buf,
+    )
+
+
+def seed(conn, employees: int = 500, sites: List[str] = SITES, drop: bool = False, seed_value: int = 42) -> Dict[str, int]:
+    """
+    Ohne drop nur in leere Tabellen: ein zweiter Lauf würde sonst jede
+    Person doppelt anlegen und die Benchmarks verfälschen.
+    """
+    counts = {}
+    with conn.cursor() as cur:
+        for site in sites:
+            create_table(cur, site, drop=drop)
+            cur.execute(sql.SQL("SELECT EXISTS (SELECT 1 FROM {})").format(sql.Identifier(table_name(site))))
+            if cur.fetchone()[0]:
+                conn.rollback()
+                raise ValueError(f"{table_name(site)} enthält bereits Daten – mit --drop neu anlegen.")
+            rows = generate_rows(site, employees, seed_value)
+            copy_rows(cur, site, rows)
+            cur.execute(sql.SQL("ANALYZE {}").format(sql.Identifier(table_name(site))))
+            counts[table_name(site)] = len(rows)
+    conn.commit()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetischen Stellenplan für Benchmarks erzeugen.")
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"))
+    parser.add_argument("--employees", type=int, default=500, help="Mitarbeitende je Standort")
+    parser.add_argument("--sites", nargs="*", default=SITES)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--drop", action="store_true", help="Tabellen vorher löschen")
+    args = parser.parse_args()
+    if not args.database_url:
+        raise SystemExit("BENCH_DATABASE_URL bzw. --database-url fehlt (nur lokale Benchmark-DB!).")
+
+    conn = psycopg2.connect(args.database_url)
+    try:
+        counts = seed(conn, args.employees, args.sites, drop=args.drop, seed_value=args.seed)
+    except ValueError as exc:
+        raise SystemExit(str(exc))
+    finally:
+        conn.close()
+    for tbl, count in counts.items():
+        print(f"{tbl}: {count} Zeilen")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Lokaler Stub für die OpenAI Chat-Completions-API (für Last-Tests von /api/ai-command
+und /api/ai-command/batch).
+Antwortet mit dem JSON-Format aus clinicon_ai.SYSTEM_PROMPT, erzeugt über text_parser.
+
+  python -m benchmarks.stub_openai --port 8089 --latency-ms 300
+  OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=stub uvicorn main:app
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+from text_parser import parse_command, parse_commands
+
+# Regex-Intents → Intents des KI-Formats
+AI_INTENTS = {
+    "adjust_person_fte_rel_full": "adjust_person_fte_rel",
+    "adjust_person_fte_rel_missing_name": "adjust_person_fte_rel",
+    "adjust_person_fte_abs_full": "adjust_person_fte_abs",
+    "adjust_person_fte_range": "adjust_person_fte_rel",
+    "move_employee_to_station_year": "move_employee_unit",
+    "check_employee_works_here": "check_employee_exists",
+    "check_employee_by_personal_number": "check_employee_exists",
+    "get_employee_station": "get_employee_unit",
+    "get_station_by_personal_number": "get_employee_unit",
+    "list_employees_on_station": "list_unit_employees",
+    "get_employee_vks_year": "get_employee_fte_year",
+    "assistant_help": "help",
+}
+
+
+def _to_number(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return float(value.replace(",", "."))
+    except ValueError:
+        return None
+
+
+def ai_result(parsed: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    if not parsed:
+        return {
+            "intent": "unknown",
+            "fields": {},
+            "confidence": 0.2,
+            "needs_clarification": True,
+            "clarification_question": "Was genau soll geändert werden?",
+            "notes": None,
+        }
+    data = parsed["data"]
+    intent = AI_INTENTS.get(parsed["intent"], "unknown")
+    vk = _to_number(data.get("vk"))
+    direction = (data.get("direction") or "reduzieren").lower()
+    fields = {
+        "employee_name": data.get("name"),
+        "personal_number": data.get("pnr"),
+        "month": data.get("month"),
+        "year": int(data["year"]) if data.get("year") else None,
+        "delta_fte": None,
+        "target_fte": None,
+        "unit": data.get("dept"),
+        "site": data.get("site"),
+    }
+    if intent == "adjust_person_fte_rel" and vk is not None:
+        fields["delta_fte"] = -vk if direction.startswith("reduz") or parsed["intent"] == "adjust_person_fte_range" else vk
+    if intent == "adjust_person_fte_abs":
+        fields["target_fte"] = vk
+    missing_name = intent.startswith("adjust") and not fields["employee_name"]
+    return {
+        "intent": intent,
+        "fields": fields,
+        "confidence": 0.9,
+        "needs_clarification": missing_name,
+        "clarification_question": "Für welchen Mitarbeiter?" if missing_name else None,
+        "notes": None,
+    }
+
+
+def completion_content(system_prompt: str, user_content: str) -> Dict[str, Any]:
+    if "MEHRERE ANWEISUNGEN (BATCH)" in system_prompt:
+        results = []
+        for item in json.loads(user_content):
+            result = ai_result(parse_command(item["command"]))
+            result["index"] = item["index"]
+            results.append(result)
+        return {"results": results}
+    if "MEHRERE BEFEHLE" in system_prompt:
+        commands = []
+        for item in parse_commands(user_content):
+            result = ai_result(item if item["action"] else None)
+            result.update({"text": item["text"], "span": list(item["span"])})
+            commands.append(result)
+        return {"commands": commands}
+    return ai_result(parse_command(user_content))
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    latency_ms = 0.0
+    jitter_ms = 0.0
+    error_rate = 0.0
+    requests = 0
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, payload: Dict[str, Any]):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send(404, {"error": {"message": f"Unbekannter Pfad {self.path}"}})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+        with StubHandler.lock:
+            StubHandler.requests += 1
+
+        delay = self.latency_ms + random.uniform(0, self.jitter_ms)
+        if delay:
+            time.sleep(delay / 1000)
+        if self.error_rate and random.random() < self.error_rate:
+            self._send(429, {"error": {"message": "Rate limit (Stub)", "type": "rate_limit_error"}})
+            return
+
+        messages = request.get("messages") or []
+        system_prompt = next((m["content"] for m in messages if m.get("role") == "system"), "")
+        user_content = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+        content = completion_content(system_prompt, user_content)
+        self._send(
+            200,
+            {
+                "id": f"chatcmpl-stub-{StubHandler.requests}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "stub"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": json.dumps(content, ensure_ascii=False)},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            },
+        )
+
+
+def serve(host: str = "127.0.0.1", port: int = 8089, latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0) -> ThreadingHTTPServer:
+    """
+    Startet den Stub im Hintergrund-Thread und gibt den Server zurück (shutdown() zum Beenden).
+    """
+    StubHandler.latency_ms = latency_ms
+    StubHandler.jitter_ms = jitter_ms
+    StubHandler.error_rate = error_rate
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-Stub für Last-Tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Anteil 429-Antworten")
+    args = parser.parse_args()
+    server = serve(args.host, args.port, args.latency_ms, args.jitter_ms, args.error_rate)
+    print(f"OpenAI-Stub läuft auf http://{args.host}:{args.port}/v1 (Strg+C beendet)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
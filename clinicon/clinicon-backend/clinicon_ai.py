@@ -1,12 +1,45 @@
 import os
 import json
-from typing import Any, Dict
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
 
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import APIConnectionError, APIStatusError, APITimeoutError, InternalServerError, OpenAI, RateLimitError
+
+from metrics import LLM_SECONDS, timed
 
 load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+_client: Optional[OpenAI] = None
+_client_lock = threading.Lock()
+
+# Batch-Parsing: Befehle je Anfrage, parallele Anfragen (prozessweit) und Wiederholungen
+AI_BATCH_SIZE = int(os.getenv("AI_BATCH_SIZE", "10"))
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "4"))
+AI_MAX_RETRIES = int(os.getenv("AI_MAX_RETRIES", "4"))
+
+_ai_slots = threading.BoundedSemaphore(AI_MAX_CONCURRENCY)
+# Nach einem 429 pausieren alle Batch-Aufrufe bis zu diesem Zeitpunkt (time.monotonic)
+_cooldown_until = 0.0
+_cooldown_lock = threading.Lock()
+
+
+def get_client() -> OpenAI:
+    """
+    OpenAI-Client, erst beim ersten Gebrauch (oder im Warm-up) angelegt.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return _client
+
+
+_RETRYABLE = (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
 
 SYSTEM_PROMPT = """
 Du bist ein Assistent für das Stellenplan- und Personalplanungssystem "Clinicon" in einem Krankenhaus.
@@ -58,21 +91,27 @@ BESONDERE REGELN:
 """
 
 
-def parse_command_with_ai(command_text: str) -> Dict[str, Any]:
-    """
-    Ruft die ChatGPT-API auf und gibt ein geparstes JSON-Objekt zurück.
-    """
-    response = client.chat.completions.create(
-        model="gpt-4.1-mini",
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": command_text},
-        ],
-        temperature=0.1,
-    )
+COMPOUND_PROMPT_SUFFIX = """
+MEHRERE BEFEHLE:
+- Der Text kann mehrere Befehle enthalten (z.B. verbunden mit "und", durch Satzzeichen getrennt oder als Liste).
+- Zerlege ihn in einzelne Befehle und gib IMMER ein JSON-Objekt der Form {"commands": [...]} zurück.
+- Jedes Element hat das obige AUSGABEFORMAT und zusätzlich:
+  "text": der Teilbefehl im Wortlaut,
+  "span": [start, end] (Zeichenpositionen des Teilbefehls im Originaltext, end exklusiv).
+- Auch bei nur einem Befehl: {"commands": [ ... ]} mit einem Element.
+"""
+
+
+BATCH_PROMPT_SUFFIX = """
+MEHRERE ANWEISUNGEN (BATCH):
+- Du erhältst ein JSON-Array [{"index": <zahl>, "command": "<text>"}, ...] mit voneinander unabhängigen Befehlen.
+- Interpretiere jeden Befehl einzeln, als wäre er allein gesendet worden.
+- Gib IMMER ein JSON-Objekt der Form {"results": [...]} zurück, mit genau einem Element je Befehl.
+- Jedes Element hat das obige AUSGABEFORMAT und zusätzlich "index" (der Index des Befehls aus der Eingabe).
+"""
 
-    content = response.choices[0].message.content or ""
 
+def _parse_json_content(content: str) -> Any:
     # Versuche, die Ausgabe als JSON zu interpretieren
     try:
         return json.loads(content)
@@ -85,6 +124,160 @@ def parse_command_with_ai(command_text: str) -> Dict[str, Any]:
         raise ValueError(f"Antwort konnte nicht als JSON geparst werden: {content}")
 
 
+def _chat(system_prompt: str, command_text: str, call: str = "chat", max_retries: Optional[int] = None) -> str:
+    client = get_client()
+    api = client if max_retries is None else client.with_options(max_retries=max_retries)
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        with timed(None, f"llm.{call}"):
+            response = api.chat.completions.create(
+                model="gpt-4.1-mini",
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": command_text},
+                ],
+                temperature=0.1,
+            )
+        outcome = "ok"
+    finally:
+        LLM_SECONDS.labels(call, outcome).observe(time.perf_counter() - start)
+    return response.choices[0].message.content or ""
+
+
+def parse_command_with_ai(command_text: str) -> Dict[str, Any]:
+    """
+    Ruft die ChatGPT-API auf und gibt ein geparstes JSON-Objekt zurück.
+    """
+    return _parse_json_content(_chat(SYSTEM_PROMPT, command_text))
+
+
+def parse_compound_command_with_ai(command_text: str) -> List[Dict[str, Any]]:
+    """
+    Wie parse_command_with_ai, aber für Texte mit mehreren Befehlen:
+    Liste von Intents (je mit "text" und "span") in der Reihenfolge des Textes.
+    """
+    parsed = _parse_json_content(_chat(SYSTEM_PROMPT + COMPOUND_PROMPT_SUFFIX, command_text, call="compound"))
+    if isinstance(parsed, dict) and isinstance(parsed.get("commands"), list):
+        commands = parsed["commands"]
+    elif isinstance(parsed, dict) and "intent" in parsed:
+        commands = [parsed]
+    else:
+        raise ValueError(f"Unerwartetes Antwortformat: {parsed}")
+    return sorted(commands, key=lambda cmd: (cmd.get("span") or [0])[0])
+
+
+def _retry_delay(exc: Exception, attempt: int) -> float:
+    retry_after = None
+    if isinstance(exc, APIStatusError):
+        retry_after = exc.response.headers.get("retry-after")
+    try:
+        if retry_after is not None:
+            return float(retry_after)
+    except ValueError:
+        pass
+    return min(30.0, 0.5 * 2 ** attempt) * random.uniform(0.8, 1.2)
+
+
+def _chat_with_retries(system_prompt: str, content: str, call: str) -> str:
+    """
+    _chat unter dem prozessweiten Semaphor; bei 429/Timeout/5xx mit Backoff
+    (Retry-After wird beachtet) und gemeinsamer Pause nach Rate-Limits.
+    """
+    global _cooldown_until
+    for attempt in range(AI_MAX_RETRIES + 1):
+        with _cooldown_lock:
+            wait = _cooldown_until - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        try:
+            with _ai_slots:
+                # Wiederholungen steuern wir hier selbst (gemeinsame Pause bei 429)
+                return _chat(system_prompt, content, call=call, max_retries=0)
+        except _RETRYABLE as exc:
+            if attempt == AI_MAX_RETRIES:
+                raise
+            delay = _retry_delay(exc, attempt)
+            if isinstance(exc, RateLimitError):
+                with _cooldown_lock:
+                    _cooldown_until = max(_cooldown_until, time.monotonic() + delay)
+            else:
+                time.sleep(delay)
+    raise RuntimeError("unreachable")
+
+
+def _parse_chunk(chunk: List[tuple]) -> Dict[int, Dict[str, Any]]:
+    """
+    Ein Request für mehrere Befehle; Ergebnis je Index. Fehlende oder
+    unbrauchbare Einträge (bzw. eine unbrauchbare Antwort) fehlen im Ergebnis
+    und werden danach einzeln nachgeparst. Scheitert der Request selbst
+    (Rate-Limit nach allen Wiederholungen, Auth, …), sind alle Befehle des
+    Chunks Fehler – ohne weitere Einzel-Requests.
+    """
+    payload = json.dumps([{"index": idx, "command": text} for idx, text in chunk], ensure_ascii=False)
+    try:
+        content = _chat_with_retries(SYSTEM_PROMPT + BATCH_PROMPT_SUFFIX, payload, call="batch")
+    except Exception as exc:
+        return {idx: {"command": text, "parsed": None, "error": str(exc)} for idx, text in chunk}
+
+    by_index: Dict[int, Dict[str, Any]] = {}
+    try:
+        parsed = _parse_json_content(content)
+        items = parsed.get("results") if isinstance(parsed, dict) else parsed
+        for item in items if isinstance(items, list) else []:
+            if isinstance(item, dict) and isinstance(item.get("index"), int) and "intent" in item:
+                by_index[item.pop("index")] = item
+    except ValueError:
+        by_index = {}
+    return {idx: {"command": text, "parsed": by_index[idx], "error": None} for idx, text in chunk if idx in by_index}
+
+
+def _parse_single(text: str, give_up: List[str]) -> Dict[str, Any]:
+    """
+    Einzel-Request für einen Befehl, den der Chunk nicht geliefert hat. Nach
+    einem API-Fehler (give_up, von allen Einzel-Requests geteilt) ohne Request.
+    """
+    if give_up:
+        return {"command": text, "parsed": None, "error": give_up[0]}
+    try:
+        parsed = _parse_json_content(_chat_with_retries(SYSTEM_PROMPT, text, call="batch_item"))
+        return {"command": text, "parsed": parsed, "error": None}
+    except Exception as exc:
+        if isinstance(exc, (_RETRYABLE, APIStatusError)):
+            # API-Problem, kein Problem des Befehls → restliche Einzel-Requests sparen
+            give_up.append(str(exc))
+        return {"command": text, "parsed": None, "error": str(exc)}
+
+
+def parse_command_batch_with_ai(
+    commands: List[str],
+    chunk_size: Optional[int] = None,
+    max_concurrency: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Parst viele Befehle mit wenigen API-Aufrufen: je chunk_size (höchstens
+    AI_BATCH_SIZE) Befehle ein Request, bis zu max_concurrency Requests
+    parallel; Einzel-Requests für fehlende Einträge laufen über denselben
+    Pool. Ergebnis in Eingabereihenfolge: {"command", "parsed", "error"} je
+    Befehl.
+    """
+    chunk_size = min(max(1, chunk_size or AI_BATCH_SIZE), AI_BATCH_SIZE)
+    workers = max(1, min(max_concurrency or AI_MAX_CONCURRENCY, AI_MAX_CONCURRENCY))
+    indexed = list(enumerate(commands))
+    chunks = [indexed[i : i + chunk_size] for i in range(0, len(indexed), chunk_size)]
+    if not chunks:
+        return []
+    results: Dict[int, Dict[str, Any]] = {}
+    with ThreadPoolExecutor(max_workers=min(workers, len(indexed))) as pool:
+        for chunk_result in pool.map(_parse_chunk, chunks):
+            results.update(chunk_result)
+        missing = [(idx, text) for idx, text in indexed if idx not in results]
+        give_up: List[str] = []
+        for (idx, _text), result in zip(missing, pool.map(lambda item: _parse_single(item[1], give_up), missing)):
+            results[idx] = result
+    return [results[idx] for idx, _text in indexed]
+
+
 if __name__ == "__main__":
     while True:
         text = input("📝 Clinicon-Befehl (exit zum Beenden): ")
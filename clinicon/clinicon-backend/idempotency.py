@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+from typing import Any, Optional, Tuple
+
+import psycopg2.extras
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Wie lange gespeicherte Antworten für Wiederholungen vorgehalten werden
+IDEMPOTENCY_TTL_HOURS = float(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+MAX_KEY_LENGTH = 255
+
+
+def ensure_idempotency_table(conn):
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS assistant_idempotency (
+              key text PRIMARY KEY,
+              request_hash text NOT NULL,
+              response jsonb,
+              created_at timestamptz NOT NULL DEFAULT now()
+            );
+            """
+        )
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS assistant_idempotency_created_idx ON assistant_idempotency (created_at)"
+        )
+    conn.commit()
+
+
+def request_fingerprint(**fields: Any) -> str:
+    """
+    Hash der Anfrage, damit ein Schlüssel nicht für eine andere Anfrage wiederverwendet wird.
+    """
+    payload = json.dumps(fields, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def lookup(conn, key: str) -> Optional[Tuple[str, Any]]:
+    """
+    (request_hash, response) einer bereits abgeschlossenen Anfrage oder None.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT request_hash, response
+            FROM assistant_idempotency
+            WHERE key = %s AND created_at >= now() - make_interval(secs => %s)
+            """,
+            (key, IDEMPOTENCY_TTL_HOURS * 3600),
+        )
+        return cur.fetchone()
+
+
+def claim(conn, key: str, request_hash: str) -> bool:
+    """
+    Reserviert den Schlüssel in der laufenden Transaktion. Läuft parallel eine
+    Anfrage mit demselben Schlüssel, wartet das INSERT auf deren Ende; False
+    heißt, dass sie inzwischen committet hat (→ lookup).
+    """
+    with conn.cursor() as cur:
+        # abgelaufener Eintrag mit demselben Schlüssel blockiert nicht
+        cur.execute(
+            "DELETE FROM assistant_idempotency WHERE key = %s AND created_at < now() - make_interval(secs => %s)",
+            (key, IDEMPOTENCY_TTL_HOURS * 3600),
+        )
+        cur.execute(
+            """
+            INSERT INTO assistant_idempotency (key, request_hash)
+            VALUES (%s, %s)
+            ON CONFLICT (key) DO NOTHING
+            RETURNING key
+            """,
+            (key, request_hash),
+        )
+        return cur.fetchone() is not None
+
+
+def store(conn, key: str, response: Any):
+    """
+    Speichert die Antwort in derselben Transaktion wie die Schreibaktion.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            "UPDATE assistant_idempotency SET response = %s WHERE key = %s",
+            (psycopg2.extras.Json(response, dumps=lambda obj: json.dumps(obj, default=str)), key),
+        )
+
+
+def purge_expired(conn) -> int:
+    with conn.cursor() as cur:
+        cur.execute(
+            "DELETE FROM assistant_idempotency WHERE created_at < now() - make_interval(secs => %s)",
+            (IDEMPOTENCY_TTL_HOURS * 3600,),
+        )
+        count = cur.rowcount
+    conn.commit()
+    return count
@@ -1,22 +1,68 @@
 import os
-from typing import Optional
+import threading
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import List, Optional
 
-import psycopg2
-import psycopg2.extras
-from fastapi import Depends, FastAPI, HTTPException
+from psycopg2.pool import ThreadedConnectionPool
+from fastapi import Depends, FastAPI, Header, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 
-from text_parser import parse_command
-from apply_actions import apply_action
-from clinicon_ai import parse_command_with_ai
+from text_parser import looks_like_command, parse_commands, warm_up as warm_up_parser
+from apply_actions import apply_actions
+from schema_catalog import catalog
+from audit_store import AuditBuffer, ensure_audit_table, log as audit_log, run_maintenance, write_audit
+from idempotency import (
+    MAX_KEY_LENGTH,
+    claim as claim_idempotency_key,
+    ensure_idempotency_table,
+    lookup as idempotency_lookup,
+    purge_expired as purge_idempotency_keys,
+    request_fingerprint,
+    store as store_idempotent_response,
+)
+from statements import PreparingConnection, use_prepared_statements
+from query_cache import READ_ACTIONS, WRITE_ACTIONS, make_key, query_cache, scope_year
+from metrics import (
+    DB_SECONDS,
+    IN_FLIGHT,
+    PARSE_SECONDS,
+    PARSE_TOTAL,
+    POOL_IN_USE,
+    POOL_MAX,
+    POOL_WAITING,
+    QUERY_CACHE_ENTRIES,
+    QUERY_CACHE_TOTAL,
+    REQUEST_SECONDS,
+    TRACE_REQUESTS,
+    finish_trace,
+    render_latest,
+    server_timing,
+    start_trace,
+    timed,
+    trace_log,
+)
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-app = FastAPI(title="CliniCon Stellenplan-Engine")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Start: Warm-up im Hintergrund (siehe start_warm_up). Ende: Pool schließen.
+    """
+    start_warm_up()
+    yield
+    _flush_audit_buffer()
+    close_pool()
+
+
+app = FastAPI(title="CliniCon Stellenplan-Engine", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -24,18 +70,155 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Server-Timing", "Idempotent-Replayed"],
 )
 
 
-def get_conn():
+@app.middleware("http")
+async def instrument_requests(request: Request, call_next):
+    """
+    Latenz je Route, laufende Anfragen und (optional) Trace-Spans als Server-Timing.
+    """
+    tracing = TRACE_REQUESTS or request.headers.get("x-clinicon-trace") == "1"
+    token = start_trace() if tracing else None
+    IN_FLIGHT.inc()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        elapsed = time.perf_counter() - start
+        IN_FLIGHT.dec()
+        route = request.scope.get("route")
+        route_path = getattr(route, "path", "unmatched")
+        REQUEST_SECONDS.labels(route_path, request.method, str(status)).observe(elapsed)
+        spans = finish_trace(token) if token is not None else None
+    if spans is not None:
+        spans.append(("total", elapsed))
+        response.headers["Server-Timing"] = server_timing(spans)
+        trace_log.info("%s %s %s %s", request.method, route_path, status, server_timing(spans))
+    return response
+
+
+# Verbindungen je Worker-Prozess: DB_POOL_MIN öffnet das Warm-up, bis zu
+# DB_POOL_MAX bleiben nach Lastspitzen offen. Summe über alle Container und
+# Worker (+ worker.js, Cron) muss unter max_connections der DB bzw. dem Limit
+# des Poolers bleiben: Container × Worker × DB_POOL_MAX.
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+AI_BATCH_MAX_COMMANDS = int(os.getenv("AI_BATCH_MAX_COMMANDS", "500"))
+# Obergrenze für chunk_size (wie in clinicon_ai)
+AI_BATCH_SIZE = int(os.getenv("AI_BATCH_SIZE", "10"))
+# Intervall der Wartung (Audit-Partitionen, Rollup, Aufbewahrung, Idempotency-Keys) in Sekunden; 0 = aus
+AUDIT_MAINTENANCE_INTERVAL = float(os.getenv("AUDIT_MAINTENANCE_INTERVAL", "900"))
+# Gepufferte Audit-Einträge (Cache-Treffer) werden in diesem Abstand geschrieben
+AUDIT_FLUSH_SECONDS = float(os.getenv("AUDIT_FLUSH_SECONDS", "2"))
+# Pause zwischen Verbindungsversuchen im Warm-up (Datenbank noch nicht erreichbar)
+WARM_UP_RETRY_SECONDS = float(os.getenv("WARM_UP_RETRY_SECONDS", "5"))
+
+_pool: Optional[ThreadedConnectionPool] = None
+_pool_lock = threading.Lock()
+# ThreadedConnectionPool wirft bei Erschöpfung sofort → Anfragen warten hier auf einen Slot
+_pool_slots = threading.BoundedSemaphore(DB_POOL_MAX)
+_bootstrapped = False
+POOL_MAX.set(DB_POOL_MAX)
+
+
+class KeepIdlePool(ThreadedConnectionPool):
+    """
+    Öffnet beim Start minconn Verbindungen, behält zurückgegebene aber bis
+    maxconn offen – psycopg2 schließt sonst alles oberhalb von minconn und
+    mit der Verbindung ihre vorbereiteten Statements.
+    """
+
+    def __init__(self, minconn: int, maxconn: int, *args, **kwargs):
+        super().__init__(minconn, maxconn, *args, **kwargs)
+        self.minconn = maxconn
+
+
+def get_pool() -> ThreadedConnectionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                factory = PreparingConnection if use_prepared_statements() else None
+                _pool = KeepIdlePool(DB_POOL_MIN, DB_POOL_MAX, DATABASE_URL, connection_factory=factory)
+    return _pool
+
+
+def close_pool():
+    with _pool_lock:
+        if _pool is not None and not _pool.closed:
+            _pool.closeall()
+
+
+def _bootstrap(conn):
+    """
+    Einmal pro Prozess: Audit-Tabelle anlegen und Schema-Katalog laden.
+    """
+    global _bootstrapped
+    with _pool_lock:
+        if _bootstrapped:
+            return
+        with timed(DB_SECONDS.labels("bootstrap"), "db.bootstrap"):
+            ensure_audit_table(conn)
+            ensure_idempotency_table(conn)
+            catalog.load(conn)
+            conn.commit()
+        _bootstrapped = True
+
+
+def acquire_conn():
     if not DATABASE_URL:
         raise HTTPException(status_code=500, detail="DATABASE_URL fehlt (siehe .env).")
+    with timed(DB_SECONDS.labels("acquire"), "db.acquire"):
+        POOL_WAITING.inc()
+        try:
+            got_slot = _pool_slots.acquire(timeout=DB_POOL_TIMEOUT)
+        finally:
+            POOL_WAITING.dec()
+        if not got_slot:
+            raise HTTPException(status_code=503, detail="Keine freie Datenbankverbindung.")
+        try:
+            conn = get_pool().getconn()
+        except Exception as exc:
+            _pool_slots.release()
+            raise HTTPException(status_code=500, detail=f"Datenbankverbindung fehlgeschlagen: {exc}") from exc
+    POOL_IN_USE.inc()
     try:
-        conn = psycopg2.connect(DATABASE_URL)
-        ensure_audit_table(conn)
-        return conn
+        if not _bootstrapped:
+            _bootstrap(conn)
     except Exception as exc:
+        release_conn(conn)
         raise HTTPException(status_code=500, detail=f"Datenbankverbindung fehlgeschlagen: {exc}") from exc
+    return conn
+
+
+def release_conn(conn):
+    """
+    Gibt die Verbindung an den Pool zurück; offene Transaktionen werden verworfen.
+    """
+    try:
+        broken = bool(conn.closed)
+        if not broken:
+            try:
+                conn.rollback()
+            except Exception:
+                broken = True
+        get_pool().putconn(conn, close=broken)
+    finally:
+        POOL_IN_USE.dec()
+        _pool_slots.release()
+
+
+def get_conn():
+    conn = acquire_conn()
+    try:
+        yield conn
+    finally:
+        release_conn(conn)
 
 
 class CommandRequest(BaseModel):
@@ -47,93 +230,210 @@ class CommandRequest(BaseModel):
 
 class AiCommandRequest(BaseModel):
     command: str
+    multi: bool = False  # True → Liste von Intents (zusammengesetzte Befehle)
 
 
-def ensure_audit_table(conn):
-    with conn.cursor() as cur:
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS assistant_audit (
-              id bigserial PRIMARY KEY,
-              created_at timestamptz DEFAULT now(),
-              site text NOT NULL,
-              command text NOT NULL,
-              action text,
-              target_table text,
-              plan_year int,
-              status text DEFAULT 'ok',
-              result jsonb
-            );
-            """
-        )
-    conn.commit()
+class AiBatchRequest(BaseModel):
+    commands: List[str]
+    chunk_size: Optional[int] = Field(None, ge=1, le=AI_BATCH_SIZE)  # Befehle je API-Aufruf (Standard: AI_BATCH_SIZE)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+def _write_audit(conn, req: CommandRequest, action: Optional[str], status: str, result):
+    with timed(DB_SECONDS.labels("audit_insert"), "db.audit_insert"):
+        write_audit(conn, req.site or "unknown", req.command, action, req.table, req.year, status, result)
+
+
+def _invalidate_writes(table: str, parsed_list: list, plan_year: int):
+    for parsed in parsed_list:
+        if parsed["action"] in WRITE_ACTIONS:
+            query_cache.invalidate(table, scope_year(parsed["action"], parsed["data"], plan_year))
+
+
+def _idempotent_replay(conn, key: str, request_hash: str):
+    """
+    Gespeicherte Antwort zu einem bereits ausgeführten Schlüssel, sonst None
+    (dann ist der Schlüssel für diese Transaktion reserviert).
+    """
+    stored = idempotency_lookup(conn, key)
+    if stored is None:
+        if claim_idempotency_key(conn, key, request_hash):
+            return None
+        stored = idempotency_lookup(conn, key)
+    if stored is None or stored[1] is None:
+        raise HTTPException(status_code=409, detail="Anfrage mit diesem Idempotency-Key wird noch bearbeitet.")
+    stored_hash, stored_response = stored
+    if stored_hash != request_hash:
+        raise HTTPException(status_code=422, detail="Idempotency-Key wurde bereits für eine andere Anfrage verwendet.")
+    return stored_response
 
 
 @app.post("/api/command")
-def api_command(req: CommandRequest, conn=Depends(get_conn)):
-    parsed = parse_command(req.command)
-    if not parsed:
+def api_command(
+    req: CommandRequest,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    idempotency_key: Optional[str] = Header(None),
+):
+    if idempotency_key is not None and not 0 < len(idempotency_key) <= MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail="Ungültiger Idempotency-Key.")
+
+    with timed(PARSE_SECONDS.labels("regex"), "parse"):
+        items = parse_commands(req.command)
+    unrecognized = [item["text"] for item in items if not item["action"]]
+    # Schreibbefehle nicht ausführen, wenn dahinter ein weiterer (verkürzter) Befehl steht
+    partial = [item["text"] for item in items if item["action"] in WRITE_ACTIONS and looks_like_command(item["rest"])]
+    if not items or unrecognized or partial:
+        PARSE_TOTAL.labels("regex", "unrecognized").inc()
+    else:
+        PARSE_TOTAL.labels("regex", "compound" if len(items) > 1 else "recognized").inc()
+    if not items or len(unrecognized) == len(items):
         raise HTTPException(status_code=400, detail="Befehl konnte nicht erkannt werden.")
+    if unrecognized:
+        raise HTTPException(
+            status_code=400,
+            detail="Teilbefehl konnte nicht erkannt werden: " + "; ".join(unrecognized),
+        )
+    if partial:
+        raise HTTPException(
+            status_code=400,
+            detail="Befehl nur teilweise erkannt, nichts ausgeführt: " + "; ".join(partial),
+        )
+
+    compound = len(items) > 1
+    if compound:
+        parsed_list = items
+        parsed = items
+        action = "compound"
+    else:
+        parsed = {key: items[0][key] for key in ("intent", "action", "data")}
+        parsed_list = [parsed]
+        action = parsed["action"]
+
+    # Leseaktionen: Treffer im Cache → ohne Datenbankverbindung beantworten;
+    # der Audit-Eintrag wird gepuffert und im Hintergrund geschrieben
+    plan_year = req.year if req.year is not None else datetime.today().year
+    cache_key = None
+    generation = None
+    if action in READ_ACTIONS:
+        cache_key = make_key(req.table, action, parsed["data"], plan_year)
+        cached = query_cache.get(cache_key)
+        if cached:
+            etag, result = cached
+            _audit_buffer.add(req.site or "unknown", req.command, action, req.table, req.year, "ok", result)
+            if _etag_matches(if_none_match, etag):
+                QUERY_CACHE_TOTAL.labels("not_modified").inc()
+                return Response(status_code=304, headers={"ETag": etag})
+            QUERY_CACHE_TOTAL.labels("hit").inc()
+            response.headers["ETag"] = etag
+            return {"parsed": parsed, "applied": result}
+        QUERY_CACHE_TOTAL.labels("miss").inc()
+        generation = query_cache.generation(req.table)
 
+    # Alle Teilbefehle + Audit-Eintrag (+ Idempotency-Key) in einer Transaktion
+    conn = acquire_conn()
     try:
-        result = apply_action(conn, req.table, parsed, year=req.year)
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                INSERT INTO assistant_audit(site, command, action, target_table, plan_year, status, result)
-                VALUES (%s,%s,%s,%s,%s,%s,%s)
-                """,
-                (
-                    req.site or "unknown",
-                    req.command,
-                    parsed.get("action"),
-                    req.table,
-                    req.year,
-                    "ok",
-                    psycopg2.extras.Json(result) if result else None,
-                ),
-            )
-        conn.commit()
+        if idempotency_key:
+            request_hash = request_fingerprint(command=req.command, table=req.table, year=req.year, site=req.site)
+            replayed = _idempotent_replay(conn, idempotency_key, request_hash)
+            if replayed is not None:
+                response.headers["Idempotent-Replayed"] = "true"
+                return replayed
+
+        applied = apply_actions(conn, req.table, parsed_list, year=req.year)
+        if compound:
+            result = applied
+            audit_result = {
+                "items": [
+                    {"action": item["action"], "span": item["span"], "applied": res}
+                    for item, res in zip(items, applied)
+                ]
+            }
+        else:
+            result = audit_result = applied[0]
+        body = {"parsed": parsed, "applied": result}
+        if compound:
+            body["compound"] = True
+        _write_audit(conn, req, action, "ok", audit_result)
+        if idempotency_key:
+            store_idempotent_response(conn, idempotency_key, body)
+        with timed(DB_SECONDS.labels("commit"), "db.commit"):
+            conn.commit()
+    except HTTPException:
+        raise
     except Exception as exc:
         try:
-            with conn.cursor() as cur:
-                cur.execute(
-                    """
-                    INSERT INTO assistant_audit(site, command, action, target_table, plan_year, status, result)
-                    VALUES (%s,%s,%s,%s,%s,%s,%s)
-                    """,
-                    (
-                        req.site or "unknown",
-                        req.command,
-                        parsed.get("action"),
-                        req.table,
-                        req.year,
-                        "error",
-                        psycopg2.extras.Json({"error": str(exc)}),
-                    ),
-                )
+            conn.rollback()
+            _write_audit(conn, req, action, "error", {"error": str(exc)})
             conn.commit()
         except Exception:
             pass
+        _invalidate_writes(req.table, parsed_list, plan_year)
         raise HTTPException(status_code=500, detail=str(exc)) from exc
     finally:
-        try:
-            conn.close()
-        except Exception:
-            pass
+        release_conn(conn)
+
+    if cache_key is not None:
+        etag = query_cache.put(cache_key, result, generation)
+        if _etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        response.headers["ETag"] = etag
+    else:
+        _invalidate_writes(req.table, parsed_list, plan_year)
 
-    return {"parsed": parsed, "applied": result}
+    return body
 
 
 @app.post("/api/ai-command")
 def api_ai_command(req: AiCommandRequest):
+    from clinicon_ai import parse_command_with_ai, parse_compound_command_with_ai
+
+    tier = "ai_compound" if req.multi else "ai"
     try:
-        parsed = parse_command_with_ai(req.command)
+        with timed(PARSE_SECONDS.labels(tier), "parse"):
+            if req.multi:
+                parsed = parse_compound_command_with_ai(req.command)
+            else:
+                parsed = parse_command_with_ai(req.command)
     except Exception as exc:
+        PARSE_TOTAL.labels(tier, "error").inc()
         raise HTTPException(status_code=500, detail=str(exc)) from exc
+    # zusammengesetzte Befehle liefern eine Liste: je Teilbefehl zählen
+    items = parsed if req.multi else [parsed]
+    if not items:
+        PARSE_TOTAL.labels(tier, "unrecognized").inc()
+    for item in items:
+        unknown = not isinstance(item, dict) or item.get("intent") == "unknown"
+        PARSE_TOTAL.labels(tier, "unrecognized" if unknown else "recognized").inc()
     return {"parsed": parsed}
 
 
+@app.post("/api/ai-command/batch")
+def api_ai_command_batch(req: AiBatchRequest):
+    """
+    Viele Befehle auf einmal per KI parsen; Fehler betreffen nur den einzelnen Befehl.
+    """
+    from clinicon_ai import parse_command_batch_with_ai
+
+    if len(req.commands) > AI_BATCH_MAX_COMMANDS:
+        raise HTTPException(status_code=400, detail=f"Maximal {AI_BATCH_MAX_COMMANDS} Befehle je Batch.")
+    with timed(PARSE_SECONDS.labels("ai_batch"), "parse"):
+        results = parse_command_batch_with_ai(req.commands, chunk_size=req.chunk_size)
+    for item in results:
+        if item["error"]:
+            PARSE_TOTAL.labels("ai_batch", "error").inc()
+        else:
+            unknown = isinstance(item["parsed"], dict) and item["parsed"].get("intent") == "unknown"
+            PARSE_TOTAL.labels("ai_batch", "unrecognized" if unknown else "recognized").inc()
+    return {"results": results}
+
+
 @app.get("/api/audit")
 def api_audit(site: str = "unknown", limit: int = 20, conn=Depends(get_conn)):
     with conn.cursor() as cur:
@@ -153,10 +453,145 @@ def api_audit(site: str = "unknown", limit: int = 20, conn=Depends(get_conn)):
     return {"audit": data}
 
 
+@app.get("/api/audit/usage")
+def api_audit_usage(site: Optional[str] = None, days: int = 30, conn=Depends(get_conn)):
+    """
+    Nutzung je Tag und Aktion aus dem Rollup (ohne Scan der Rohdaten).
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT day, site, action, status, commands
+            FROM assistant_audit_daily
+            WHERE day >= current_date - %s
+              AND (%s::text IS NULL OR site = %s)
+            ORDER BY day DESC, site, action, status
+            """,
+            (days, site, site),
+        )
+        rows = cur.fetchall()
+        cols = [desc[0] for desc in cur.description]
+    return {"usage": [dict(zip(cols, r)) for r in rows]}
+
+
+_audit_buffer = AuditBuffer()
+
+
+def _flush_audit_buffer():
+    if not DATABASE_URL or not len(_audit_buffer):
+        return
+    try:
+        conn = acquire_conn()
+        try:
+            _audit_buffer.flush(conn)
+        finally:
+            release_conn(conn)
+    except Exception as exc:
+        audit_log.warning("Gepufferte Audit-Einträge nicht geschrieben: %s", exc)
+
+
+def _audit_flush_loop():
+    while True:
+        time.sleep(AUDIT_FLUSH_SECONDS)
+        _flush_audit_buffer()
+
+
+def _maintenance_loop():
+    """
+    Audit-Wartung und Aufräumen abgelaufener Idempotency-Keys.
+    """
+    while True:
+        try:
+            conn = acquire_conn()
+            try:
+                run_maintenance(conn)
+                purge_idempotency_keys(conn)
+            finally:
+                release_conn(conn)
+        except Exception as exc:
+            audit_log.warning("Audit-Wartung fehlgeschlagen: %s", exc)
+        time.sleep(AUDIT_MAINTENANCE_INTERVAL)
+
+
+# Zustand des Warm-ups für /ready: status pending → warming → ready, Dauer je Schritt in ms
+_readiness = {"status": "pending", "steps": {}, "error": None}
+
+
+def _warm_up_step(name: str, fn):
+    start = time.perf_counter()
+    fn()
+    _readiness["steps"][name] = round((time.perf_counter() - start) * 1000, 1)
+
+
+def _warm_up_ai_client():
+    from clinicon_ai import get_client
+
+    get_client()
+
+
+def _warm_up_database():
+    """
+    Pool öffnen (DB_POOL_MIN Verbindungen), Tabellen anlegen und Schema-Katalog
+    laden; wiederholt, bis die Datenbank erreichbar ist.
+    """
+    while True:
+        try:
+            release_conn(acquire_conn())
+            return
+        except HTTPException as exc:
+            _readiness["error"] = exc.detail
+            audit_log.warning("Warm-up: Datenbank nicht erreichbar (%s), neuer Versuch in %.0fs", exc.detail, WARM_UP_RETRY_SECONDS)
+            time.sleep(WARM_UP_RETRY_SECONDS)
+
+
+def _warm_up():
+    _readiness["status"] = "warming"
+    try:
+        _warm_up_step("parser", warm_up_parser)
+        if os.getenv("OPENAI_API_KEY"):
+            _warm_up_step("ai_client", _warm_up_ai_client)
+        if DATABASE_URL:
+            _warm_up_step("database", _warm_up_database)
+    except Exception as exc:
+        _readiness.update(status="failed", error=str(exc))
+        audit_log.exception("Warm-up fehlgeschlagen")
+        return
+    _readiness.update(status="ready", error=None)
+    if DATABASE_URL:
+        threading.Thread(target=_audit_flush_loop, name="audit-flush", daemon=True).start()
+    if DATABASE_URL and AUDIT_MAINTENANCE_INTERVAL > 0:
+        threading.Thread(target=_maintenance_loop, name="maintenance", daemon=True).start()
+
+
+def start_warm_up():
+    """
+    Warm-up im Hintergrund: Die App nimmt sofort Anfragen an (/health),
+    /ready meldet erst danach Bereitschaft.
+    """
+    threading.Thread(target=_warm_up, name="warm-up", daemon=True).start()
+
+
+@app.get("/metrics")
+def metrics():
+    QUERY_CACHE_ENTRIES.set(query_cache.stats()["entries"])
+    payload, content_type = render_latest()
+    return Response(content=payload, media_type=content_type)
+
+
 @app.get("/health")
 def health():
     return {"status": "ok"}
 
 
+@app.get("/ready")
+def ready(response: Response):
+    """
+    Readiness: 200 nach abgeschlossenem Warm-up, sonst 503 mit dem aktuellen Stand.
+    """
+    if _readiness["status"] != "ready":
+        response.status_code = 503
+    return _readiness
+
+
 # Hinweis: Start im Terminal
 # uvicorn main:app --reload
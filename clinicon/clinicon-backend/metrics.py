@@ -0,0 +1,138 @@
+import contextvars
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+from dotenv import load_dotenv
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+
+load_dotenv()
+
+# Mehrere Worker-Prozesse (uvicorn --workers, gunicorn): PROMETHEUS_MULTIPROC_DIR
+# auf ein leeres, beschreibbares Verzeichnis setzen, bevor die Prozesse starten
+# (vor jedem Deploy leeren). /metrics fasst dann alle Worker zusammen; ohne die
+# Variable zeigt jeder Worker nur seine eigenen Zahlen.
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR") or os.getenv("prometheus_multiproc_dir")
+
+# Schwelle für das Slow-Query-Log in Millisekunden (0 = aus)
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+# Trace-Spans für jede Anfrage (sonst nur mit Header X-Clinicon-Trace: 1)
+TRACE_REQUESTS = os.getenv("TRACE_REQUESTS", "").lower() in {"1", "true", "yes"}
+
+slow_query_log = logging.getLogger("clinicon.slowquery")
+trace_log = logging.getLogger("clinicon.trace")
+
+_FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+_SLOW_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0)
+
+REQUEST_SECONDS = Histogram(
+    "clinicon_request_seconds", "Dauer der HTTP-Anfragen", ["route", "method", "status"]
+)
+INTENT_SECONDS = Histogram(
+    "clinicon_intent_seconds", "Dauer der Aktion je Intent (apply_action)", ["intent"], buckets=_FAST_BUCKETS
+)
+PARSE_SECONDS = Histogram(
+    "clinicon_parse_seconds", "Dauer des Parsens je Stufe", ["tier"], buckets=_FAST_BUCKETS
+)
+PARSE_TOTAL = Counter(
+    "clinicon_parse_total", "Geparste Befehle je Stufe und Ergebnis", ["tier", "outcome"]
+)
+DB_SECONDS = Histogram(
+    "clinicon_db_seconds", "Dauer von Datenbank-Operationen", ["operation"], buckets=_FAST_BUCKETS
+)
+STATEMENTS_TOTAL = Counter(
+    "clinicon_statements_total", "Ausgeführte Statements (prepare/execute/plain)", ["mode"]
+)
+SLOW_QUERIES_TOTAL = Counter("clinicon_slow_queries_total", "Statements über SLOW_QUERY_MS")
+LLM_SECONDS = Histogram(
+    "clinicon_llm_seconds", "Dauer der LLM-Aufrufe", ["call", "outcome"], buckets=_SLOW_BUCKETS
+)
+QUERY_CACHE_TOTAL = Counter(
+    "clinicon_query_cache_total", "Lookups im Ergebnis-Cache", ["result"]
+)
+QUERY_CACHE_ENTRIES = Gauge("clinicon_query_cache_entries", "Einträge im Ergebnis-Cache", multiprocess_mode="livesum")
+POOL_MAX = Gauge("clinicon_db_pool_max", "Maximale Anzahl Pool-Verbindungen", multiprocess_mode="livesum")
+POOL_IN_USE = Gauge("clinicon_db_pool_in_use", "Ausgeliehene Pool-Verbindungen", multiprocess_mode="livesum")
+POOL_WAITING = Gauge("clinicon_db_pool_waiting", "Anfragen, die auf eine Verbindung warten", multiprocess_mode="livesum")
+IN_FLIGHT = Gauge("clinicon_requests_in_flight", "Gerade bearbeitete HTTP-Anfragen", multiprocess_mode="livesum")
+
+# Spans der laufenden Anfrage: [(name, Sekunden)] oder None, wenn nicht getraced wird
+_spans: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar(
+    "clinicon_spans", default=None
+)
+
+
+def start_trace() -> contextvars.Token:
+    return _spans.set([])
+
+
+def finish_trace(token: contextvars.Token) -> List[Tuple[str, float]]:
+    spans = _spans.get() or []
+    _spans.reset(token)
+    return spans
+
+
+def server_timing(spans: List[Tuple[str, float]]) -> str:
+    """
+    Spans als Server-Timing-Header ("db.acquire;dur=0.42, action;dur=3.1").
+    """
+    return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in spans)
+
+
+@contextmanager
+def timed(observer, span: Optional[str] = None):
+    """
+    Misst den Block, trägt ihn ins Histogramm ein und – falls die Anfrage
+    getraced wird – als Span.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if observer is not None:
+            observer.observe(elapsed)
+        spans = _spans.get()
+        if spans is not None and span:
+            spans.append((span, elapsed))
+
+
+def log_slow_query(cur, text: str, params, elapsed: float, explain_sql: Optional[str] = None):
+    """
+    Protokolliert das gerenderte Statement samt EXPLAIN. EXPLAIN läuft in einem
+    Savepoint, damit ein Fehler die laufende Transaktion nicht abbricht.
+    """
+    SLOW_QUERIES_TOTAL.inc()
+    try:
+        rendered = cur.mogrify(text, params or None).decode("utf-8", "replace")
+    except Exception:
+        rendered = text
+    plan = None
+    conn = cur.connection
+    # eigener Cursor, damit das Ergebnis des Aufrufers erhalten bleibt
+    with conn.cursor() as explain_cur:
+        try:
+            if not conn.autocommit:
+                explain_cur.execute("SAVEPOINT clinicon_explain")
+            explain_cur.execute(explain_sql or f"EXPLAIN {text}", params or None)
+            plan = "\n".join(row[0] for row in explain_cur.fetchall())
+            if not conn.autocommit:
+                explain_cur.execute("RELEASE SAVEPOINT clinicon_explain")
+        except Exception as exc:
+            plan = f"EXPLAIN fehlgeschlagen: {exc}"
+            if not conn.autocommit:
+                try:
+                    explain_cur.execute("ROLLBACK TO SAVEPOINT clinicon_explain")
+                except Exception:
+                    pass
+    slow_query_log.warning("Langsames Statement (%.1f ms):\n%s\n%s", elapsed * 1000, rendered, plan)
+
+
+def render_latest() -> Tuple[bytes, str]:
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
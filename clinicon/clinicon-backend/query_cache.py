@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+# Lesende Aktionen, deren Ergebnis zwischengespeichert werden darf.
+READ_ACTIONS = {
+    "check_employee_works_here",
+    "get_employee_station",
+    "list_employees_on_station",
+    "get_employee_vks_year",
+    "get_station_vks_year",
+    "check_employee_by_personal_number",
+    "get_station_by_personal_number",
+    "list_employees_site_year",
+}
+
+# Schreibende Aktionen → invalidieren Tabelle/Jahr nach dem Commit.
+WRITE_ACTIONS = {
+    "adjust_person_fte_rel",
+    "adjust_person_fte_rel_full",
+    "adjust_person_fte_abs",
+    "adjust_person_fte_abs_full",
+    "transfer_staff_unit",
+    "move_employee_to_station_year",
+    "adjust_person_fte_range",
+    "exclude_employee_year",
+}
+
+# Schreibaktionen, die in das übergebene Planjahr schreiben (nicht in das Jahr
+# aus dem Befehlstext), siehe apply_actions._dispatch_action.
+_WRITES_TO_PLAN_YEAR = {
+    "adjust_person_fte_rel",
+    "adjust_person_fte_rel_full",
+    "adjust_person_fte_abs",
+    "adjust_person_fte_abs_full",
+}
+
+# Aktionen, die über alle Planjahre lesen, wenn kein Jahr im Befehl steht.
+_ALL_YEARS_WITHOUT_DATA_YEAR = {
+    "list_employees_on_station",
+    "check_employee_by_personal_number",
+    "get_station_by_personal_number",
+}
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, str):
+        return " ".join(value.lower().split())
+    return value
+
+
+def scope_year(action: str, data: dict, year: Optional[int]) -> Optional[int]:
+    """
+    Planjahr, auf das sich eine Aktion bezieht; None = alle Jahre der Tabelle.
+    """
+    if action == "adjust_person_fte_range":
+        from_part = (data.get("from") or "").rsplit(".", 1)
+        return int(from_part[-1]) if from_part[-1].isdigit() else None
+    if action == "get_station_by_personal_number":
+        return None
+    if action in _WRITES_TO_PLAN_YEAR:
+        return year
+    if data.get("year"):
+        return int(data["year"])
+    if action in _ALL_YEARS_WITHOUT_DATA_YEAR:
+        return None
+    if action in {"transfer_staff_unit", "move_employee_to_station_year"}:
+        date_part = (data.get("date") or "").rsplit(".", 1)
+        return int(date_part[-1]) if date_part[-1].isdigit() else None
+    return year
+
+
+def make_key(table: str, action: str, data: dict, year: Optional[int]) -> Tuple:
+    """
+    Cache-Schlüssel aus (Tabelle, Aktion, normalisierte Argumente, Jahr).
+    """
+    args = tuple(sorted((k, _normalize(v)) for k, v in data.items() if v is not None))
+    return (table, action, args, scope_year(action, data, year))
+
+
+def _serialize(result: Any) -> bytes:
+    return json.dumps(result, sort_keys=True, default=str, ensure_ascii=False).encode("utf-8")
+
+
+def make_etag(result: Any) -> str:
+    return '"' + hashlib.sha1(_serialize(result)).hexdigest() + '"'
+
+
+class QueryCache:
+    """
+    LRU-Cache für Leseergebnisse, begrenzt über die Anzahl der Einträge und
+    die ungefähre Größe (serialisiertes JSON). Einträge werden nach eigenen
+    Schreibaktionen pro Tabelle/Jahr verworfen; Änderungen anderer Prozesse
+    (worker.js, weitere Instanzen) sieht der Cache erst nach ttl_seconds.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 30.0, max_bytes: int = 32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple, Tuple[float, str, Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def generation(self, table: str) -> int:
+        """
+        Zähler je Tabelle; vor der Leseabfrage merken und an put() übergeben,
+        damit parallel invalidierte Ergebnisse nicht wieder im Cache landen.
+        """
+        with self._lock:
+            return self._generations.get(table, 0)
+
+    def _drop(self, key: Tuple):
+        self._bytes -= self._entries.pop(key)[3]
+
+    def get(self, key: Tuple) -> Optional[Tuple[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, etag, result, _size = entry
+            if self.ttl_seconds and time.monotonic() - stored_at > self.ttl_seconds:
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return etag, result
+
+    def put(self, key: Tuple, result: Any, generation: Optional[int] = None) -> str:
+        payload = _serialize(result)
+        etag = '"' + hashlib.sha1(payload).hexdigest() + '"'
+        size = len(payload)
+        # einzelne Riesen-Ergebnisse (z. B. alle Mitarbeitenden eines Standorts) nicht cachen
+        if self.max_entries <= 0 or (self.max_bytes and size > self.max_bytes // 4):
+            return etag
+        with self._lock:
+            if generation is not None and self._generations.get(key[0], 0) != generation:
+                return etag
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic(), etag, result, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or (self.max_bytes and self._bytes > self.max_bytes):
+                self._drop(next(iter(self._entries)))
+        return etag
+
+    def invalidate(self, table: str, year: Optional[int] = None) -> int:
+        """
+        Verwirft alle Einträge der Tabelle für das Jahr sowie jahresübergreifende
+        Einträge. year=None verwirft die komplette Tabelle.
+        """
+        with self._lock:
+            self._generations[table] = self._generations.get(table, 0) + 1
+            stale = [
+                key
+                for key in self._entries
+                if key[0] == table and (year is None or key[3] is None or key[3] == year)
+            ]
+            for key in stale:
+                self._drop(key)
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+load_dotenv()
+
+# Kurze TTL: begrenzt, wie lange Schreibzugriffe anderer Prozesse unbemerkt bleiben
+query_cache = QueryCache(
+    max_entries=int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "512")),
+    ttl_seconds=float(os.getenv("QUERY_CACHE_TTL_SECONDS", "30")),
+    max_bytes=int(os.getenv("QUERY_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+)
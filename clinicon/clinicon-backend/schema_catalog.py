@@ -0,0 +1,96 @@
+import threading
+import time
+from typing import Dict, FrozenSet, Iterable, List, Optional
+
+SITE_TABLE_PREFIX = "stellenplan_employees_"
+
+# Je nach Standort heißt die Personalnummer-Spalte unterschiedlich.
+PNR_COLUMNS = ("personal_number", "personalnumber")
+
+# Frühestens nach so vielen Sekunden wird bei unbekannter Tabelle oder
+# fehlender Spalte neu geladen.
+RELOAD_INTERVAL_SECONDS = 60.0
+
+
+class SchemaCatalog:
+    """
+    Zwischenspeicher der Standort-Tabellen und ihrer Spalten aus information_schema.
+    Solange nichts geladen ist, wird nicht validiert (Verhalten wie bisher).
+    """
+
+    def __init__(self):
+        self._tables: Optional[Dict[str, FrozenSet[str]]] = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._tables is not None
+
+    def load(self, conn) -> Dict[str, FrozenSet[str]]:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT table_name, column_name
+                FROM information_schema.columns
+                WHERE table_schema = 'public' AND table_name LIKE %s
+                """,
+                (SITE_TABLE_PREFIX.replace("_", r"\_") + "%",),
+            )
+            rows = cur.fetchall()
+        tables: Dict[str, set] = {}
+        for table_name, column_name in rows:
+            tables.setdefault(table_name, set()).add(column_name)
+        with self._lock:
+            self._tables = {name: frozenset(cols) for name, cols in tables.items()}
+            self._loaded_at = time.monotonic()
+        return self._tables
+
+    def tables(self) -> List[str]:
+        return sorted(self._tables or {})
+
+    def ensure_table(self, conn, table_name: str):
+        """
+        Prüft die Tabelle gegen den Katalog; lädt neu, wenn er fehlt oder eine
+        unbekannte Tabelle angefragt wird (z. B. neuer Standort).
+        """
+        stale = time.monotonic() - self._loaded_at > RELOAD_INTERVAL_SECONDS
+        if not self.loaded or (table_name not in self._tables and stale):
+            self.load(conn)
+        self.require_table(table_name)
+
+    def ensure_columns(self, conn, table_name: str, columns: Iterable[str]):
+        """
+        Wie require_columns; fehlt eine Spalte (z. B. nachträglich angelegt oder
+        Tabelle neu erstellt), wird der Katalog vorher einmal neu geladen.
+        """
+        columns = list(columns)
+        if self.loaded and table_name in self._tables and any(col not in self._tables[table_name] for col in columns):
+            if time.monotonic() - self._loaded_at > RELOAD_INTERVAL_SECONDS:
+                self.load(conn)
+        self.require_columns(table_name, columns)
+
+    def require_table(self, table_name: str):
+        if self.loaded and table_name not in self._tables:
+            raise ValueError(f"Unbekannte Stellenplan-Tabelle: {table_name}")
+
+    def require_columns(self, table_name: str, columns: Iterable[str]):
+        if not self.loaded:
+            return
+        self.require_table(table_name)
+        available = self._tables[table_name]
+        missing = [col for col in columns if col not in available]
+        if missing:
+            raise ValueError(f"Spalte(n) {', '.join(missing)} fehlen in {table_name}.")
+
+    def pnr_columns(self, table_name: str) -> List[str]:
+        """
+        Vorhandene Personalnummer-Spalten der Tabelle.
+        """
+        if not self.loaded:
+            return list(PNR_COLUMNS)
+        self.require_table(table_name)
+        return [col for col in PNR_COLUMNS if col in self._tables[table_name]]
+
+
+catalog = SchemaCatalog()
@@ -0,0 +1,125 @@
+import hashlib
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+
+import psycopg2.errors
+import psycopg2.extensions
+from psycopg2 import sql
+
+from metrics import DB_SECONDS, SLOW_QUERY_MS, STATEMENTS_TOTAL, log_slow_query, timed
+
+MAX_PREPARED_PER_CONNECTION = int(os.getenv("MAX_PREPARED_PER_CONNECTION", "128"))
+# Serverseitige Prepared Statements (on/off). Nur für direkte Verbindungen bzw.
+# Pooler im Session-Modus einschalten – hinter einem Transaktions-Pooler
+# (PgBouncer, Supabase/Supavisor) landet EXECUTE sonst in fremden Sessions.
+DB_PREPARED_STATEMENTS = os.getenv("DB_PREPARED_STATEMENTS", "off").lower()
+
+log = logging.getLogger("clinicon.statements")
+
+_PLACEHOLDER = re.compile(r"%s")
+
+
+class PreparingConnection(psycopg2.extensions.connection):
+    """
+    Verbindung mit Registry der serverseitig vorbereiteten Statements
+    (Statement-Text → PREPARE-Name). Nur mit Pool sinnvoll, da die
+    Statements an die Datenbank-Session gebunden sind.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared_statements = OrderedDict()
+
+
+def use_prepared_statements() -> bool:
+    return DB_PREPARED_STATEMENTS in {"1", "true", "on", "yes"}
+
+
+def _disable_prepared(conn, reason: str):
+    """
+    Die Session kennt unsere Statements nicht (mehr) – typisch für einen
+    Transaktions-Pooler. Die Verbindung arbeitet ab jetzt ohne PREPARE.
+    """
+    if conn.prepared_statements is not None:
+        log.warning("Prepared Statements für diese Verbindung abgeschaltet (%s); DB_PREPARED_STATEMENTS=off setzen?", reason)
+    conn.prepared_statements = None
+
+
+def _to_positional(text: str) -> str:
+    """
+    '... name = %s AND year = %s' → '... name = $1 AND year = $2'
+    """
+    counter = iter(range(1, 10_000))
+    return _PLACEHOLDER.sub(lambda _m: f"${next(counter)}", text).replace("%%", "%")
+
+
+def execute(cur, query, params=()):
+    """
+    Führt ein (dynamisch zusammengesetztes) Statement aus. Auf einer
+    PreparingConnection wird jede Statement-Form einmal per PREPARE angelegt
+    und danach nur noch per EXECUTE aufgerufen.
+    """
+    conn = cur.connection
+    text = query.as_string(conn) if isinstance(query, sql.Composable) else query
+    registry = getattr(conn, "prepared_statements", None)
+    if registry is None:
+        STATEMENTS_TOTAL.labels("plain").inc()
+        start = time.perf_counter()
+        with timed(DB_SECONDS.labels("statement"), "db.statement"):
+            cur.execute(text, params)
+        _check_slow(cur, text, params, start)
+        return
+
+    first_in_transaction = conn.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_IDLE
+    name = registry.get(text)
+    if name is None:
+        name = "cc_" + hashlib.sha1(text.encode("utf-8")).hexdigest()[:20]
+        STATEMENTS_TOTAL.labels("prepare").inc()
+        with timed(DB_SECONDS.labels("prepare"), "db.prepare"):
+            # Savepoint: ein schon vorhandenes Statement (gleicher Name = gleicher
+            # Text) darf die laufende Transaktion nicht abbrechen
+            savepoint = not conn.autocommit
+            if savepoint:
+                cur.execute("SAVEPOINT clinicon_prepare")
+            try:
+                cur.execute(f"PREPARE {name} AS {_to_positional(text)}")
+            except psycopg2.errors.DuplicatePreparedStatement:
+                if savepoint:
+                    cur.execute("ROLLBACK TO SAVEPOINT clinicon_prepare")
+            if savepoint:
+                cur.execute("RELEASE SAVEPOINT clinicon_prepare")
+        registry[text] = name
+        while len(registry) > MAX_PREPARED_PER_CONNECTION:
+            _old_text, old_name = registry.popitem(last=False)
+            cur.execute(f"DEALLOCATE {old_name}")
+    else:
+        registry.move_to_end(text)
+
+    if params:
+        placeholders = ", ".join(["%s"] * len(params))
+        execute_sql = f"EXECUTE {name} ({placeholders})"
+    else:
+        execute_sql = f"EXECUTE {name}"
+    STATEMENTS_TOTAL.labels("execute").inc()
+    start = time.perf_counter()
+    try:
+        with timed(DB_SECONDS.labels("statement"), "db.statement"):
+            cur.execute(execute_sql, params or None)
+    except psycopg2.errors.InvalidSqlStatementName:
+        _disable_prepared(conn, f"{name} fehlt in der Session")
+        if not first_in_transaction:
+            raise
+        # noch nichts in dieser Transaktion ausgeführt → gefahrlos ohne PREPARE wiederholen
+        conn.rollback()
+        execute(cur, text, params)
+        return
+    _check_slow(cur, text, params, start, explain_sql="EXPLAIN " + execute_sql)
+
+
+def _check_slow(cur, text: str, params, start: float, explain_sql=None):
+    elapsed = time.perf_counter() - start
+    if SLOW_QUERY_MS and elapsed * 1000 >= SLOW_QUERY_MS:
+        log_slow_query(cur, text, params, elapsed, explain_sql)
@@ -0,0 +1,78 @@
+import time
+from decimal import Decimal
+
+import pytest
+
+import apply_actions
+from apply_actions import apply_actions as run_actions
+from text_parser import parse_commands
+
+TABLE = "stellenplan_employees_gfodin"
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def fetchone(self):
+        return self.rows.pop(0)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeConnection:
+    """
+    Liefert der Reihe nach die Zeilen für fetchone; statements.execute wird
+    durch eine Aufzeichnung der Parameter ersetzt.
+    """
+
+    def __init__(self, rows):
+        self.cursor_obj = FakeCursor(rows)
+        self.executed = []
+        self.commits = 0
+
+    def cursor(self):
+        return self.cursor_obj
+
+    def commit(self):
+        self.commits += 1
+
+
+@pytest.fixture
+def conn(monkeypatch):
+    connection = FakeConnection([(1, Decimal("1.0")), (2, "Station 1")])
+    monkeypatch.setattr(apply_actions, "execute", lambda cur, query, params=(): connection.executed.append(params))
+    monkeypatch.setattr(apply_actions.catalog, "_tables", {TABLE: frozenset({"id", "name", "year", "dept", "mrz_2027"})})
+    monkeypatch.setattr(apply_actions.catalog, "_loaded_at", time.monotonic())
+    return connection
+
+
+def test_compound_example_applies_both_actions(conn):
+    items = parse_commands("Setze Meier ab März 2027 auf 0,5 VK und versetze Schulz ab 2027 auf Station 3")
+
+    fte, transfer = run_actions(conn, TABLE, items, year=2027)
+
+    assert fte["column"] == "mrz_2027"
+    assert fte["new_value"] == "0.5"
+    assert transfer["old_dept"] == "Station 1"
+    assert transfer["new_dept"] == "Station 3"
+    assert transfer["effective_from"] == "2027"
+    assert conn.executed == [
+        ("Meier", 2027),
+        (Decimal("0.5"), 1),
+        ("Schulz", 2027),
+        ("Station 3", 2),
+    ]
+    # der Aufrufer committet (eine Transaktion für alle Teilbefehle)
+    assert conn.commits == 0
+
+
+def test_unknown_column_rejected(conn, monkeypatch):
+    monkeypatch.setattr(apply_actions.catalog, "_tables", {TABLE: frozenset({"id", "name", "year", "dept"})})
+    items = parse_commands("Setze Meier ab März 2027 auf 0,5 VK")
+    with pytest.raises(ValueError, match="mrz_2027"):
+        run_actions(conn, TABLE, items, year=2027)
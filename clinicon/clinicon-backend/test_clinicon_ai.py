@@ -0,0 +1,83 @@
+import socket
+import threading
+import time
+
+import pytest
+
+import clinicon_ai
+from benchmarks import stub_openai
+
+COMMANDS = [f"Setze Meier{i} ab März 2027 auf 0,5 VK" for i in range(30)]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    """
+    OpenAI-Stub auf freiem Port; StubHandler.requests zählt die Requests.
+    """
+    port = _free_port()
+    server = stub_openai.serve(port=port)
+    monkeypatch.setattr(stub_openai.StubHandler, "requests", 0)
+    monkeypatch.setenv("OPENAI_BASE_URL", f"http://127.0.0.1:{port}/v1")
+    monkeypatch.setenv("OPENAI_API_KEY", "stub")
+    monkeypatch.setattr(clinicon_ai, "_client", None)
+    monkeypatch.setattr(clinicon_ai, "_cooldown_until", 0.0)
+    monkeypatch.setattr(clinicon_ai, "AI_MAX_RETRIES", 0)
+    monkeypatch.setattr(clinicon_ai, "_retry_delay", lambda exc, attempt: 0.0)
+    yield stub_openai.StubHandler
+    server.shutdown()
+    server.server_close()
+
+
+def test_batch_uses_one_request_per_chunk(stub):
+    results = clinicon_ai.parse_command_batch_with_ai(COMMANDS, chunk_size=10)
+    assert stub.requests == 3
+    assert [item["command"] for item in results] == COMMANDS
+    assert all(item["error"] is None for item in results)
+    assert results[7]["parsed"]["fields"]["employee_name"] == "Meier7"
+
+
+def test_chunk_size_is_capped(stub):
+    clinicon_ai.parse_command_batch_with_ai(COMMANDS, chunk_size=1000)
+    assert stub.requests == len(COMMANDS) // clinicon_ai.AI_BATCH_SIZE
+
+
+def test_rate_limited_chunks_do_not_fan_out(stub, monkeypatch):
+    # früher: je Chunk ein Batch-Request plus ein Einzel-Request je Befehl
+    monkeypatch.setattr(stub, "error_rate", 1.0)
+    results = clinicon_ai.parse_command_batch_with_ai(COMMANDS, chunk_size=10)
+    assert stub.requests == 3
+    assert all(item["error"] and item["parsed"] is None for item in results)
+
+
+def test_missing_items_are_parsed_concurrently(stub, monkeypatch):
+    active, peak = [0], [0]
+    lock = threading.Lock()
+    original = stub_openai.completion_content
+
+    def incomplete(system_prompt, user_content):
+        content = original(system_prompt, user_content)
+        if "results" in content:
+            # nur den ersten Eintrag jedes Chunks liefern
+            content["results"] = content["results"][:1]
+        else:
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+        return content
+
+    monkeypatch.setattr(stub_openai, "completion_content", incomplete)
+    results = clinicon_ai.parse_command_batch_with_ai(COMMANDS[:8], chunk_size=4)
+
+    assert stub.requests == 2 + 6
+    assert [item["parsed"]["fields"]["employee_name"] for item in results] == [f"Meier{i}" for i in range(8)]
+    assert peak[0] > 1
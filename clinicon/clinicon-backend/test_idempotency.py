@@ -0,0 +1,66 @@
+import pytest
+from fastapi import HTTPException
+
+import main
+from idempotency import request_fingerprint
+
+REQUEST_HASH = request_fingerprint(command="Hilfe Stellenplan", table="t", year=2027, site="X")
+
+
+@pytest.fixture
+def store(monkeypatch):
+    """
+    Schlüssel → (request_hash, response) wie in assistant_idempotency;
+    claim() schlägt fehl, wenn der Schlüssel schon existiert.
+    """
+    rows = {}
+
+    def claim(conn, key, request_hash):
+        if key in rows:
+            return False
+        rows[key] = (request_hash, None)
+        return True
+
+    monkeypatch.setattr(main, "idempotency_lookup", lambda conn, key: rows.get(key))
+    monkeypatch.setattr(main, "claim_idempotency_key", claim)
+    return rows
+
+
+def test_request_fingerprint_is_order_independent():
+    assert request_fingerprint(a=1, b="x") == request_fingerprint(b="x", a=1)
+    assert request_fingerprint(a=1, b="x") != request_fingerprint(a=2, b="x")
+
+
+def test_new_key_is_claimed(store):
+    assert main._idempotent_replay(None, "k1", REQUEST_HASH) is None
+    assert store["k1"] == (REQUEST_HASH, None)
+
+
+def test_completed_request_is_replayed(store):
+    body = {"parsed": {"action": "assistant_help"}, "applied": {"help": True}}
+    store["k1"] = (REQUEST_HASH, body)
+    assert main._idempotent_replay(None, "k1", REQUEST_HASH) == body
+
+
+def test_key_reused_for_other_request(store):
+    store["k1"] = (request_fingerprint(command="anders"), {"applied": {}})
+    with pytest.raises(HTTPException) as exc:
+        main._idempotent_replay(None, "k1", REQUEST_HASH)
+    assert exc.value.status_code == 422
+
+
+def test_request_still_in_progress(store):
+    store["k1"] = (REQUEST_HASH, None)
+    with pytest.raises(HTTPException) as exc:
+        main._idempotent_replay(None, "k1", REQUEST_HASH)
+    assert exc.value.status_code == 409
+
+
+def test_claim_lost_to_concurrent_request(store, monkeypatch):
+    # lookup sieht den Schlüssel noch nicht, das INSERT wartet auf die andere
+    # Transaktion und findet danach deren Antwort
+    body = {"applied": {"help": True}}
+    lookups = iter([None, (REQUEST_HASH, body)])
+    monkeypatch.setattr(main, "idempotency_lookup", lambda conn, key: next(lookups))
+    store["k1"] = (REQUEST_HASH, body)
+    assert main._idempotent_replay(None, "k1", REQUEST_HASH) == body
@@ -0,0 +1,86 @@
+import query_cache
+from query_cache import QueryCache, make_key, scope_year
+
+
+def test_scope_year_fte_writes_use_plan_year_not_text_year():
+    # "Setze Meier ab März 2027 auf 0,5 VK" schreibt in das übergebene Planjahr
+    data = {"name": "Meier", "month": "März", "year": "2027", "vk": "0,5"}
+    assert scope_year("adjust_person_fte_abs_full", data, 2026) == 2026
+    assert scope_year("adjust_person_fte_rel_full", dict(data, direction="reduzieren"), 2026) == 2026
+
+
+def test_scope_year_reads_use_text_year():
+    assert scope_year("get_employee_vks_year", {"name": "Meier", "year": "2027"}, 2026) == 2027
+
+
+def test_scope_year_range_and_transfer():
+    assert scope_year("adjust_person_fte_range", {"from": "01.03.2028", "to": "30.06.2028"}, 2026) == 2028
+    assert scope_year("move_employee_to_station_year", {"name": "Schulz", "year": "2027", "dept": "Station 3"}, 2026) == 2027
+    assert scope_year("transfer_staff_unit", {"name": "Schulz", "date": "01.04.2029", "unit": "Station 5"}, 2026) == 2029
+
+
+def test_scope_year_all_years():
+    assert scope_year("list_employees_on_station", {"dept": "Station 3", "year": None}, 2026) is None
+    assert scope_year("get_station_by_personal_number", {"pnr": "123"}, 2026) is None
+
+
+def test_make_key_normalizes_arguments():
+    a = make_key("t", "get_employee_vks_year", {"name": "  Meier ", "year": "2027"}, 2026)
+    b = make_key("t", "get_employee_vks_year", {"name": "meier", "year": "2027", "extra": None}, 2026)
+    assert a == b
+    assert a[3] == 2027
+
+
+def test_invalidate_by_year():
+    cache = QueryCache()
+    k2026 = make_key("t", "get_employee_vks_year", {"name": "meier", "year": "2026"}, 2026)
+    k2027 = make_key("t", "get_employee_vks_year", {"name": "meier", "year": "2027"}, 2026)
+    k_all = make_key("t", "list_employees_on_station", {"dept": "station 3"}, 2026)
+    for key in (k2026, k2027, k_all):
+        cache.put(key, {"key": str(key)})
+
+    write = {"name": "Meier", "month": "März", "year": "2027", "vk": "0,5"}
+    cache.invalidate("t", scope_year("adjust_person_fte_abs_full", write, 2026))
+
+    assert cache.get(k2026) is None
+    assert cache.get(k_all) is None
+    assert cache.get(k2027) is not None
+
+
+def test_put_skipped_after_concurrent_invalidate():
+    cache = QueryCache()
+    key = make_key("t", "get_employee_vks_year", {"name": "meier", "year": "2026"}, 2026)
+    generation = cache.generation("t")
+    cache.invalidate("t", 2026)
+    cache.put(key, {"stale": True}, generation)
+    assert cache.get(key) is None
+
+
+def test_cache_bounded_by_payload_size():
+    cache = QueryCache(max_entries=100, max_bytes=4000)
+    keys = [make_key("t", "get_employee_vks_year", {"name": f"m{i}", "year": "2026"}, 2026) for i in range(5)]
+    for key in keys:
+        cache.put(key, {"rows": "x" * 900})
+    assert cache.stats()["bytes"] <= 4000
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[-1]) is not None
+
+
+def test_oversized_result_not_cached():
+    cache = QueryCache(max_bytes=4000)
+    key = make_key("t", "list_employees_site_year", {"site": "gfodin", "year": "2027"}, 2026)
+    etag = cache.put(key, {"employees": ["x" * 100] * 20})
+    assert etag.startswith('"')
+    assert cache.get(key) is None
+    assert cache.stats()["bytes"] == 0
+
+
+def test_ttl_expires_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(query_cache.time, "monotonic", lambda: now[0])
+    cache = QueryCache(ttl_seconds=30)
+    key = make_key("t", "get_employee_vks_year", {"name": "meier", "year": "2026"}, 2026)
+    cache.put(key, {"vk": "1.0"})
+    now[0] += 31
+    assert cache.get(key) is None
+    assert cache.stats()["bytes"] == 0
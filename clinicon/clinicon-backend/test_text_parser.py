@@ -0,0 +1,73 @@
+from text_parser import looks_like_command, parse_command, parse_commands, split_command
+
+EXAMPLE = "Setze Meier ab März 2027 auf 0,5 VK und versetze Schulz ab 2027 auf Station 3"
+
+
+def test_split_command_spans():
+    segments = split_command(EXAMPLE)
+    assert [seg["text"] for seg in segments] == [
+        "Setze Meier ab März 2027 auf 0,5 VK",
+        "versetze Schulz ab 2027 auf Station 3",
+    ]
+    for seg in segments:
+        start, end = seg["span"]
+        assert EXAMPLE[start:end] == seg["text"]
+
+
+def test_parse_commands_example():
+    first, second = parse_commands(EXAMPLE)
+    assert first["action"] == "adjust_person_fte_abs_full"
+    assert first["data"]["name"] == "Meier"
+    assert first["data"]["vk"] == "0,5"
+    assert second["action"] == "move_employee_to_station_year"
+    assert second["data"] == {"name": "Schulz", "year": "2027", "dept": "Station 3"}
+    assert first["rest"] == second["rest"] == ""
+
+
+def test_split_on_comma_before_new_command():
+    items = parse_commands("Setze Meier ab März 2027 auf 0,5 VK, setze Schulz ab April 2027 auf 0,8 VK")
+    assert [item["data"]["name"] for item in items] == ["Meier", "Schulz"]
+    assert [item["data"]["vk"] for item in items] == ["0,5", "0,8"]
+
+
+def test_decimal_comma_is_not_a_separator():
+    assert len(split_command("Setze Meier ab März 2027 auf 0,5 VK")) == 1
+
+
+def test_elided_verb_leaves_rest():
+    (item,) = parse_commands("Setze Meier ab März 2027 auf 0,5 VK sowie Schulz ab April 2027 auf 0,8 VK")
+    assert item["action"] == "adjust_person_fte_abs_full"
+    assert item["rest"] == "sowie Schulz ab April 2027 auf 0,8 VK"
+    assert looks_like_command(item["rest"])
+
+
+def test_polite_suffix_is_accepted():
+    for text in ("Setze Meier ab März 2027 auf 0,5 VK, danke", "Setze Meier ab März 2027 auf 0,5 VK bitte"):
+        (item,) = parse_commands(text)
+        assert item["action"] == "adjust_person_fte_abs_full"
+        assert item["rest"] in {"danke", "bitte"}
+        assert not looks_like_command(item["rest"])
+
+
+def test_leftover_with_fte_spec_is_a_command():
+    assert looks_like_command("Schulz auf 0,8 VK")
+    assert looks_like_command("Schulz ab April")
+    assert not looks_like_command("")
+
+
+def test_sentences_and_semicolons():
+    items = parse_commands(
+        "Wie viele VK hat Meier im Jahr 2027? Wie viele VK sind auf Station 3 im Jahr 2027 geplant; Hilfe Stellenplan"
+    )
+    assert [item["action"] for item in items] == ["get_employee_vks_year", "get_station_vks_year", "assistant_help"]
+
+
+def test_unrecognized_segment():
+    items = parse_commands("Setze Meier ab März 2027 auf 0,5 VK; bitte Kaffee kochen")
+    assert items[1]["action"] is None
+    assert items[1]["rest"] == "bitte Kaffee kochen"
+
+
+def test_parse_command_single():
+    assert parse_command("Bitte den Dienstplan ausdrucken") is None
+    assert parse_command("Wie viele VK hat Meier im Jahr 2027?")["action"] == "get_employee_vks_year"
@@ -1,127 +1,220 @@
 import re
-from typing import Dict, Optional
+from functools import lru_cache
+from typing import Dict, List, Optional, Pattern, Tuple
 
-# Intent-Patterns (re.UNICODE / IGNORECASE)
-INTENT_PATTERNS = [
+_FLAGS = re.IGNORECASE | re.UNICODE
+
+# Intent-Patterns (re.UNICODE / IGNORECASE); kompiliert erst beim ersten Gebrauch
+INTENT_PATTERN_SOURCES = [
     (
         "adjust_person_fte_rel_full",
-        re.compile(
-            r"mitarbeiter\s+(?P<name>[\wÄÖÜäöüß\s\-]+)\s+möchte\s+zum\s+(?P<month>\w+)\s+(?P<year>\d{4})\s+seinen\s+stellenanteil\s+um\s+(?P<vk>[0-9\.,]+)\s+vk\s+(?P<direction>reduzieren|erhöhen|erhoehen)",
-            re.IGNORECASE | re.UNICODE,
-        ),
+        r"mitarbeiter\s+(?P<name>[\wÄÖÜäöüß\s\-]+)\s+möchte\s+zum\s+(?P<month>\w+)\s+(?P<year>\d{4})\s+seinen\s+stellenanteil\s+um\s+(?P<vk>[0-9\.,]+)\s+vk\s+(?P<direction>reduzieren|erhöhen|erhoehen)",
     ),
     (
         "adjust_person_fte_rel_missing_name",
-        re.compile(
-            r"ein\s+mitarbeiter\s+möchte\s+zum\s+(?P<month>\w+)\s+(?P<year>\d{4})\s+seinen\s+stellenanteil\s+um\s+(?P<vk>[0-9\.,]+)\s+vk\s+(?P<direction>reduzieren|erhöhen|erhoehen)",
-            re.IGNORECASE | re.UNICODE,
-        ),
+        r"ein\s+mitarbeiter\s+möchte\s+zum\s+(?P<month>\w+)\s+(?P<year>\d{4})\s+seinen\s+stellenanteil\s+um\s+(?P<vk>[0-9\.,]+)\s+vk\s+(?P<direction>reduzieren|erhöhen|erhoehen)",
     ),
     (
         "adjust_person_fte_abs_full",
-        re.compile(
-            r"setze\s+(?P<name>[\wÄÖÜäöüß\s\-]+)\s+ab\s+(?P<month>\w+)\s+(?P<year>\d{4})\s+auf\s+(?P<vk>[0-9\.,]+)\s+vk",
-            re.IGNORECASE | re.UNICODE,
-        ),
+        r"setze\s+(?P<name>[\wÄÖÜäöüß\s\-]+)\s+ab\s+(?P<month>\w+)\s+(?P<year>\d{4})\s+auf\s+(?P<vk>[0-9\.,]+)\s+vk",
     ),
     (
         "check_employee_works_here",
-        re.compile(
-            r"(arbeitet|ist)\s+(?:ein[e]?\s+)?(?P<name>[\wÄÖÜäöüß\s\-]+)\s+(hier|bei\s+uns)\s*(\?)?",
-            re.IGNORECASE | re.UNICODE,
-        ),
+        r"(arbeitet|ist)\s+(?:ein[e]?\s+)?(?P<name>[\wÄÖÜäöüß\s\-]+)\s+(hier|bei\s+uns)\s*(\?)?",
     ),
     (
         "get_employee_station",
-        re.compile(
-            r"(auf\s+welcher\s+station\s+arbeitet|wo\s+ist)\s+(?P<name>[\wÄÖÜäöüß\s\-]+)\s*(eingeteilt|tätig|taetig)?\s*(\?)?",
-            re.IGNORECASE | re.UNICODE,
-        ),
+        r"(auf\s+welcher\s+station\s+arbeitet|wo\s+ist)\s+(?P<name>[\wÄÖÜäöüß\s\-]+)\s*(eingeteilt|tätig|taetig)?\s*(\?)?",
     ),
     (
         "list_employees_on_station",
-        re.compile(
-            r"(welche\s+mitarbeiter\s+arbeiten\s+auf|wer\s+ist\s+auf)\s+(?P<dept>station\s*\d+|intensivstation|imc|[\wÄÖÜäöüß0-9\s\-]+)\s+(im\s+jahr\s+(?P<year>\d{4}))?\s*(\?)?",
-            re.IGNORECASE | re.UNICODE,
-        ),
+        r"(welche\s+mitarbeiter\s+arbeiten\s+auf|wer\s+ist\s+auf)\s+(?P<dept>station\s*\d+|intensivstation|imc|[\wÄÖÜäöüß0-9\s\-]+)\s+(im\s+jahr\s+(?P<year>\d{4}))?\s*(\?)?",
     ),
     (
         "get_employee_vks_year",
-        re.compile(
-            r"wie\s+viele\s+vk\s+hat\s+(?P<name>[\wÄÖÜäöüß\s\-]+)\s+im\s+jahr\s+(?P<year>\d{4})\s*(\?)?",
-            re.IGNORECASE | re.UNICODE,
-        ),
+        r"wie\s+viele\s+vk\s+hat\s+(?P<name>[\wÄÖÜäöüß\s\-]+)\s+im\s+jahr\s+(?P<year>\d{4})\s*(\?)?",
     ),
     (
         "get_station_vks_year",
-        re.compile(
-            r"wie\s+viele\s+vk\s+sind\s+auf\s+(?P<dept>station\s*\d+|[\wÄÖÜäöüß0-9\s\-]+)\s+im\s+jahr\s+(?P<year>\d{4})\s+geplant\s*(\?)?",
-            re.IGNORECASE | re.UNICODE,
-        ),
+        r"wie\s+viele\s+vk\s+sind\s+auf\s+(?P<dept>station\s*\d+|[\wÄÖÜäöüß0-9\s\-]+)\s+im\s+jahr\s+(?P<year>\d{4})\s+geplant\s*(\?)?",
     ),
     (
         "move_employee_to_station_year",
-        re.compile(
-            r"(verschiebe|versetze)\s+(?P<name>[\wÄÖÜäöüß\s\-]+)\s+ab\s+(?P<year>\d{4})\s+auf\s+(?P<dept>station\s*\d+|bereich\s+[\wÄÖÜäöüß0-9\s\-]+|[\wÄÖÜäöüß0-9\s\-]+)",
-            re.IGNORECASE | re.UNICODE,
-        ),
+        r"(verschiebe|versetze)\s+(?P<name>[\wÄÖÜäöüß\s\-]+)\s+ab\s+(?P<year>\d{4})\s+auf\s+(?P<dept>station\s*\d+|bereich\s+[\wÄÖÜäöüß0-9\s\-]+|[\wÄÖÜäöüß0-9\s\-]+)",
     ),
     (
         "adjust_person_fte_range",
-        re.compile(
-            r"reduziere\s+(?P<name>[\wÄÖÜäöüß\s\-]+)\s+vom\s+(?P<from>\d{1,2}\.\d{1,2}\.\d{4})\s+bis\s+(?P<to>\d{1,2}\.\d{1,2}\.\d{4})\s+um\s+(?P<vk>[0-9\.,]+)\s+vk(?:\s+wegen\s+(?P<reason>.+))?",
-            re.IGNORECASE | re.UNICODE,
-        ),
+        r"reduziere\s+(?P<name>[\wÄÖÜäöüß\s\-]+)\s+vom\s+(?P<from>\d{1,2}\.\d{1,2}\.\d{4})\s+bis\s+(?P<to>\d{1,2}\.\d{1,2}\.\d{4})\s+um\s+(?P<vk>[0-9\.,]+)\s+vk(?:\s+wegen\s+(?P<reason>.+))?",
     ),
     (
         "exclude_employee_year",
-        re.compile(
-            r"(nimm|setze)\s+(?P<name>[\wÄÖÜäöüß\s\-]+)\s+im\s+jahr\s+(?P<year>\d{4})\s+aus\s+der\s+planung\s+raus|auf\s+nicht\s+einplanen",
-            re.IGNORECASE | re.UNICODE,
-        ),
+        r"(nimm|setze)\s+(?P<name>[\wÄÖÜäöüß\s\-]+)\s+im\s+jahr\s+(?P<year>\d{4})\s+aus\s+der\s+planung\s+raus|auf\s+nicht\s+einplanen",
     ),
     (
         "check_employee_by_personal_number",
-        re.compile(
-            r"(gibt\s+es\s+einen\s+mitarbeiter\s+mit\s+der\s+personalnummer|existiert\s+die\s+personalnummer)\s+(?P<pnr>\d+)(\s+im\s+stellenplan\s+(?P<year>\d{4}))?\s*(\?)?",
-            re.IGNORECASE | re.UNICODE,
-        ),
+        r"(gibt\s+es\s+einen\s+mitarbeiter\s+mit\s+der\s+personalnummer|existiert\s+die\s+personalnummer)\s+(?P<pnr>\d+)(\s+im\s+stellenplan\s+(?P<year>\d{4}))?\s*(\?)?",
     ),
     (
         "get_station_by_personal_number",
-        re.compile(
-            r"auf\s+welcher\s+station\s+arbeitet\s+der\s+mitarbeiter\s+mit\s+der\s+personalnummer\s+(?P<pnr>\d+)\s*(\?)?",
-            re.IGNORECASE | re.UNICODE,
-        ),
+        r"auf\s+welcher\s+station\s+arbeitet\s+der\s+mitarbeiter\s+mit\s+der\s+personalnummer\s+(?P<pnr>\d+)\s*(\?)?",
     ),
     (
         "list_employees_site_year",
-        re.compile(
-            r"(zeig\s+mir|liste)\s+alle\s+mitarbeiter\s+vom\s+standort\s+(?P<site>[A-Za-z0-9_]+)\s+im\s+jahr\s+(?P<year>\d{4})",
-            re.IGNORECASE | re.UNICODE,
-        ),
+        r"(zeig\s+mir|liste)\s+alle\s+mitarbeiter\s+vom\s+standort\s+(?P<site>[A-Za-z0-9_]+)\s+im\s+jahr\s+(?P<year>\d{4})",
     ),
     (
         "assistant_help",
-        re.compile(
-            r"(was\s+kann\s+der\s+stellenplan[-\s]*assistent|welche\s+befehle\s+kann\s+ich\s+benutzen|hilfe\s+stellenplan)",
-            re.IGNORECASE | re.UNICODE,
-        ),
+        r"(was\s+kann\s+der\s+stellenplan[-\s]*assistent|welche\s+befehle\s+kann\s+ich\s+benutzen|hilfe\s+stellenplan)",
     ),
 ]
 
 
+@lru_cache(maxsize=None)
+def get_intent_patterns() -> Tuple[Tuple[str, Pattern], ...]:
+    """
+    Kompilierte Intent-Patterns (einmalig beim ersten Aufruf bzw. im Warm-up).
+    """
+    return tuple((intent, re.compile(source, _FLAGS)) for intent, source in INTENT_PATTERN_SOURCES)
+
+
+def _match_command(text: str) -> Tuple[Optional[str], Optional[re.Match]]:
+    for intent, pattern in get_intent_patterns():
+        match = pattern.search(text)
+        if match:
+            return intent, match
+    return None, None
+
+
 def parse_command(text: str) -> Optional[Dict[str, Dict[str, str]]]:
     """
     Nimmt einen Textbefehl und gibt {intent/action, data} zurück oder None.
     """
-    cleaned = text.strip()
-    for intent, pattern in INTENT_PATTERNS:
-        match = pattern.search(cleaned)
+    intent, match = _match_command(text.strip())
+    if not match:
+        return None
+    return {"intent": intent, "action": intent, "data": match.groupdict()}
+
+
+# Anfänge eines neuen Befehls (entsprechend den Intent-Patterns oben)
+COMMAND_STARTS = (
+    r"mitarbeiter|ein\s+mitarbeiter|setze|nimm|arbeitet|ist|auf\s+welcher|wo\s+ist|welche|wer\s+ist|"
+    r"wie\s+viele|verschiebe|versetze|reduziere|gibt\s+es|existiert|zeig|liste|was\s+kann|hilfe"
+)
+
+# Trenner zwischen Teilbefehlen: Semikolon, Zeilenumbruch sowie Satzende, Komma
+# oder "und"/"sowie"/"außerdem", sofern danach ein neuer Befehl beginnt.
+COMMAND_SEPARATOR_SOURCE = (
+    r"\s*(?:[;\n]|[.!?](?=\s*$|\s+(?:" + COMMAND_STARTS + r")\b)"
+    r"|,\s*(?=(?:" + COMMAND_STARTS + r")\b)"
+    r"|,?\s+(?:und|sowie|außerdem|ausserdem)\s+(?=(?:" + COMMAND_STARTS + r")\b))\s*"
+)
+
+# Satzzeichen am Ende, die ein Pattern nicht verbrauchen muss
+_TRAILING_PUNCTUATION = " \t.,;:!?"
+
+# Rest nach einem Schreibbefehl, der nach einem weiteren (verkürzten) Befehl
+# aussieht: beginnt mit und/sowie/außerdem oder enthält VK, Monat oder Jahr.
+# Höflichkeiten wie ", danke" oder "bitte" fallen nicht darunter.
+ELIDED_COMMAND_SOURCE = (
+    r"^(?:und|sowie|außerdem|ausserdem)\b"
+    r"|\b\d+(?:[.,]\d+)?\s*vk\b"
+    r"|\b(?:januar|februar|märz|maerz|april|mai|juni|juli|august|september|oktober|november|dezember)\b"
+    r"|\b\d{4}\b"
+)
+
+
+@lru_cache(maxsize=None)
+def _elided_command() -> Pattern:
+    return re.compile(ELIDED_COMMAND_SOURCE, _FLAGS)
+
+
+def looks_like_command(rest: str) -> bool:
+    """
+    True, wenn nicht verarbeiteter Text (rest aus parse_commands) vermutlich
+    einen weiteren Befehl enthält, der sonst stillschweigend entfiele.
+    """
+    return bool(rest) and bool(_elided_command().search(rest))
+
+
+@lru_cache(maxsize=None)
+def get_command_separator() -> Pattern:
+    return re.compile(COMMAND_SEPARATOR_SOURCE, _FLAGS)
+
+
+def split_command(text: str) -> List[Dict[str, object]]:
+    """
+    Zerlegt einen Text in Teilbefehle: [{text, span: (start, end)}, ...].
+    """
+    segments = []
+    pos = 0
+    for sep in get_command_separator().finditer(text):
+        if sep.start() > pos:
+            segments.append((pos, sep.start()))
+        pos = sep.end()
+    if pos < len(text):
+        segments.append((pos, len(text)))
+
+    result = []
+    for start, end in segments:
+        chunk = text[start:end]
+        stripped = chunk.strip()
+        if not stripped:
+            continue
+        start += len(chunk) - len(chunk.lstrip())
+        result.append({"text": stripped, "span": (start, start + len(stripped))})
+    return result
+
+
+def parse_commands(text: str) -> List[Dict[str, object]]:
+    """
+    Wie parse_command, aber für zusammengesetzte Befehle
+    ("Setze Meier ab März 2027 auf 0,5 VK und versetze Schulz ab 2027 auf Station 3").
+    Liefert je Teilbefehl {intent/action, data, text, span, rest}; nicht erkannte
+    Teile haben intent/action = None. rest ist der Text hinter dem erkannten
+    Befehl (z. B. "sowie Schulz ab April 2027 auf 0,8 VK" ohne Verb), der nicht
+    verarbeitet wurde.
+    """
+    results = []
+    for segment in split_command(text):
+        intent, match = _match_command(segment["text"])
         if match:
-            data = match.groupdict()
-            return {"intent": intent, "action": intent, "data": data}
-    return None
+            rest = segment["text"][match.end():].strip(_TRAILING_PUNCTUATION)
+            results.append(
+                {
+                    "intent": intent,
+                    "action": intent,
+                    "data": match.groupdict(),
+                    "text": segment["text"],
+                    "span": segment["span"],
+                    "rest": rest,
+                }
+            )
+        else:
+            results.append(
+                {"intent": None, "action": None, "data": {}, "text": segment["text"], "span": segment["span"], "rest": segment["text"]}
+            )
+    return results
+
+
+# Beispielbefehle für warm_up (berühren alle Patterns)
+WARM_UP_COMMANDS = [
+    "Setze Meier ab März 2027 auf 0,5 VK und versetze Schulz ab 2027 auf Station 3",
+    "Wie viele VK hat Meier im Jahr 2027? Wie viele VK sind auf Station 3 im Jahr 2027 geplant?",
+    "Reduziere Meier vom 01.03.2027 bis 30.06.2027 um 0,2 VK wegen Elternzeit",
+    "Bitte den Dienstplan ausdrucken",
+]
+
+
+def warm_up() -> int:
+    """
+    Kompiliert alle Patterns und lässt den Parser einmal laufen; Anzahl der Patterns.
+    """
+    patterns = get_intent_patterns()
+    get_command_separator()
+    _elided_command()
+    for command in WARM_UP_COMMANDS:
+        parse_commands(command)
+    return len(patterns)
 
 
 if __name__ == "__main__":
@@ -129,5 +222,5 @@ if __name__ == "__main__":
         cmd = input("📝 Befehl (exit zum Beenden): ")
         if cmd.lower() in {"exit", "quit"}:
             break
-        result = parse_command(cmd)
-        print("Ergebnis:", result)
+        result = parse_commands(cmd)
+        print("Ergebnis:", result if len(result) != 1 else result[0])